@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+from urllib.parse import quote
+
+import requests
+from requests.adapters import BaseAdapter
+
+from src.scrappers import collocations, meanings, synonyms
+from src.scrappers.http_client import create_session, set_session
+from src.scrappers.rate_limit import set_rate_limit, wait_for_turn
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+INDEX_FILE = 'index.json'
+
+
+def page_urls(word):
+    """
+    Return the URLs the scrappers request for a word.
+    """
+    return {
+        'meanings': meanings.BASE_URL + quote(word),
+        'collocations': collocations.BASE_URL + quote(word),
+        'synonyms': synonyms.URL_TEMPLATE.format(word=word),
+    }
+
+
+def _fixture_name(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest() + '.gz'
+
+
+def load_index(fixtures_dir=FIXTURES_DIR):
+    with open(os.path.join(fixtures_dir, INDEX_FILE), encoding='utf-8') as index_file:
+        return json.load(index_file)
+
+
+def save_index(fixtures_dir, index):
+    with open(os.path.join(fixtures_dir, INDEX_FILE), 'w', encoding='utf-8') as index_file:
+        json.dump(index, index_file, indent=1)
+
+
+def read_fixture(fixtures_dir, url):
+    with gzip.open(os.path.join(fixtures_dir, _fixture_name(url)), 'rb') as fixture:
+        return fixture.read()
+
+
+def save_fixture(fixtures_dir, url, body):
+    with gzip.open(os.path.join(fixtures_dir, _fixture_name(url)), 'wb') as fixture:
+        fixture.write(body)
+
+
+def record(words, fixtures_dir=FIXTURES_DIR):
+    """
+    Download the pages and audio of every word from the live sites and save them as fixtures.
+    The index maps each word to its page URLs and each URL to its status code.
+    """
+    os.makedirs(fixtures_dir, exist_ok=True)
+    session = create_session()
+    index = {'words': {}, 'urls': {}}
+    for i, word in enumerate(words):
+        urls = page_urls(word)
+        for url in urls.values():
+            _record_url(session, url, fixtures_dir, index)
+        if index['urls'][urls['meanings']] == 200:
+            word_data = meanings.parse_word_meanings(read_fixture(fixtures_dir, urls['meanings']))
+            urls['audio'] = sorted({entry['audio_url'] for dict_body in word_data.values() for entry in dict_body
+                                    if entry['audio_url']})
+            for url in urls['audio']:
+                _record_url(session, url, fixtures_dir, index)
+        index['words'][word] = urls
+        print(f"{i}: recorded '{word}'.")
+    save_index(fixtures_dir, index)
+    return index
+
+
+def _record_url(session, url, fixtures_dir, index):
+    if url in index['urls']:
+        return
+    wait_for_turn(url)
+    response = session.get(url)
+    index['urls'][url] = response.status_code
+    save_fixture(fixtures_dir, url, response.content)
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    A transport adapter that answers requests from recorded fixtures instead of the network.
+    Unknown URLs get a 404.
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        super().__init__()
+        self.fixtures_dir = fixtures_dir
+        self.statuses = load_index(fixtures_dir)['urls']
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = self.statuses.get(request.url, 404)
+        body = read_fixture(self.fixtures_dir, request.url) if request.url in self.statuses else b''
+        response.raw = io.BytesIO(body)
+        response.headers['Content-Length'] = str(len(body))
+        response.encoding = 'utf-8'
+        return response
+
+    def close(self):
+        pass
+
+
+def install_replay(fixtures_dir=FIXTURES_DIR):
+    """
+    Route the shared HTTP session through the fixtures and lift the politeness budgets.
+    """
+    session = requests.Session()
+    adapter = ReplayAdapter(fixtures_dir)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    set_session(session)
+    for url in adapter.statuses:
+        set_rate_limit(requests.utils.urlparse(url).hostname, rate=1e9, burst=1e9)
+    return adapter
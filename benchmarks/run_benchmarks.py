@@ -0,0 +1,243 @@
+"""
+Offline benchmarks of the scraping pipeline.
+
+Record fixtures once (needs network access):
+    python -m benchmarks.run_benchmarks record words.csv
+Time every stage against the fixtures:
+    python -m benchmarks.run_benchmarks run [--words 300] [--parser lxml]
+Check that every parser backend extracts the same data, from the synthetic pages in benchmarks/pages or from
+recorded fixtures:
+    python -m benchmarks.run_benchmarks check-parsers [--fixtures benchmarks/fixtures]
+Check that the peak memory of a bounded-memory build, audio included, stays flat as the word count grows, on
+synthetic pages:
+    python -m benchmarks.run_benchmarks memory [--sizes 50 100 200 400]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.replay import FIXTURES_DIR, install_replay, load_index, read_fixture, record
+from benchmarks.synthetic import synthetic_fixtures, write_synthetic
+from src.dataset.create_csv import read_words
+from src.instrumentation.metrics import percentile
+from src.scrappers import parsing
+from src.scrappers.collocations import parse_collocations
+from src.scrappers.http_client import fetch
+from src.scrappers.meanings import parse_word_meanings
+from src.scrappers.synonyms import parse_synonyms
+
+PARSER_BACKENDS = [('html.parser', False), ('html.parser', True), ('lxml', False), ('lxml', True)]
+
+
+class StageTimer:
+    def __init__(self):
+        self.durations = {}
+        self.peaks = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations.setdefault(name, []).append(time.perf_counter() - start)
+            self.peaks[name] = max(self.peaks.get(name, 0), tracemalloc.get_traced_memory()[1])
+
+    def report(self, word_count):
+        print(f"{'stage':<14}{'total s':>10}{'words/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'peak MiB':>10}")
+        for name, durations in self.durations.items():
+            total = sum(durations)
+            print(f"{name:<14}{total:>10.2f}{word_count / total if total else 0:>10.1f}"
+                  f"{percentile(durations, 0.5) * 1000:>10.2f}{percentile(durations, 0.95) * 1000:>10.2f}"
+                  f"{self.peaks[name] / 2 ** 20:>10.2f}")
+
+
+def parse_pages(pages, word):
+    """
+    Run the three extractors on the raw pages of a word. A missing synonyms section yields None.
+    """
+    word_data = parse_word_meanings(pages['meanings']) if pages.get('meanings') else {}
+    collocations = parse_collocations(pages['collocations']) if pages.get('collocations') else []
+    try:
+        synonyms = parse_synonyms(pages['synonyms'], word) if pages.get('synonyms') else None
+    except Exception:
+        synonyms = None
+    return word_data, collocations, synonyms
+
+
+def run(word_limit=None, parser=None, fixtures_dir=FIXTURES_DIR):
+    from src.anki.ankideck_generator import create_anki_deck
+    from src.dataset.create_csv import get_tags
+    from src.html.html_generator import generate_html_from_json
+
+    if parser:
+        parsing.HTML_PARSER = parser
+    install_replay(fixtures_dir)
+    words = load_index(fixtures_dir)['words']
+    words = list(words.items())[:word_limit]
+    timer = StageTimer()
+    records = []
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for word, urls in words:
+            with timer.stage('fetch'):
+                pages = {}
+                for source, url in urls.items():
+                    if source == 'audio':
+                        for audio_url in url:
+                            fetch(audio_url, cache=False)
+                        continue
+                    response = fetch(url, cache=False)
+                    pages[source] = response.content if response.status_code == 200 else None
+            with timer.stage('meanings'):
+                word_data = parse_word_meanings(pages['meanings']) if pages['meanings'] else {}
+            with timer.stage('collocations'):
+                collocations = parse_collocations(pages['collocations']) if pages['collocations'] else []
+            with timer.stage('synonyms'):
+                try:
+                    synonyms = parse_synonyms(pages['synonyms'], word) if pages['synonyms'] else None
+                except Exception:
+                    synonyms = None
+            with timer.stage('html'):
+                records.append({'word': word, 'meaning': generate_html_from_json(word_data, collocations, synonyms),
+                                'tags': get_tags(word_data)})
+        with tempfile.TemporaryDirectory() as output_dir, timer.stage('deck'):
+            create_anki_deck('Benchmark', records, os.path.join(output_dir, 'benchmark.apkg'))
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    print(f"{len(words)} words in {elapsed:.2f}s ({len(words) / elapsed:.1f} words/s), parser: {parsing.HTML_PARSER}")
+    timer.report(len(words))
+
+
+def memory(sizes=(50, 100, 200, 400), tolerance=1.5):
+    """
+    Build bounded-memory decks of growing word counts through build_deck, audio included, and compare the peak traced
+    memory of the builds. Every build has its own made-up words with synthetic pages (see benchmarks/synthetic.py),
+    so each word is fetched, parsed and rendered, and its pronunciation downloaded, as on a first run. The metrics
+    keep as many duration samples as the smallest build takes, so their sample is full, as it would be on a long run,
+    from the first build on.
+
+    The HTTP cache, entry cache, media store and offline store are swapped for temporary ones, so the replayed pages
+    never reach the real ones, and every setting changed here is restored afterwards.
+
+    :param tolerance: The largest allowed ratio between the highest and the lowest peak.
+    :return: True if the peaks stay within the tolerance.
+    """
+    from src.dataset import offline_store
+    from src.dataset.pipeline import build_deck
+    from src.instrumentation.metrics import metrics
+    from src.scrappers import entry_cache, http_cache, media_store
+
+    # The first build also pays for the lazy imports, sessions and caches set up on first use
+    builds = [min(sizes)] + list(sizes)
+    saved = (http_cache.get_cache(), entry_cache.get_entry_cache(), media_store.get_media_store(),
+             offline_store.get_offline_store(), metrics.max_samples)
+    peaks = {}
+    with tempfile.TemporaryDirectory() as output_dir, open(os.devnull, 'w') as devnull:
+        word_lists = [[f"word{build}x{i}" for i in range(size)] for build, size in enumerate(builds)]
+        fixtures_dir = os.path.join(output_dir, 'fixtures')
+        write_synthetic(fixtures_dir, list(itertools.chain.from_iterable(word_lists)))
+        install_replay(fixtures_dir)
+        http_cache.set_cache(http_cache.ResponseCache(path=os.path.join(output_dir, 'http_cache.sqlite3')))
+        entry_cache.set_entry_cache(entry_cache.EntryCache(os.path.join(output_dir, 'entry_cache.sqlite3')))
+        media_store.set_media_store(media_store.MediaStore(os.path.join(output_dir, 'audio'),
+                                                           os.path.join(output_dir, 'audio', 'index.sqlite3')))
+        offline_store.set_offline_store(offline_store.OfflineStore(os.path.join(output_dir, 'offline.sqlite3')))
+        metrics.max_samples = min(sizes)
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(devnull):
+                for build, words in enumerate(word_lists):
+                    input_csv_path = os.path.join(output_dir, f"{build}.csv")
+                    with open(input_csv_path, 'w', encoding='utf-8') as input_file:
+                        input_file.write('\n'.join(['word'] + words) + '\n')
+                    metrics.reset()
+                    tracemalloc.reset_peak()
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    build_deck(input_csv_path, 'Memory', os.path.join(output_dir, f"{build}.apkg"),
+                               bounded_memory=True)
+                    peaks[len(words)] = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+            http_cache.set_cache(saved[0])
+            entry_cache.set_entry_cache(saved[1])
+            media_store.set_media_store(saved[2])
+            offline_store.set_offline_store(saved[3])
+            metrics.max_samples = saved[4]
+
+    print(f"{'words':>8}{'peak MiB':>10}")
+    for size, peak in peaks.items():
+        print(f"{size:>8}{peak / 2 ** 20:>10.2f}")
+    ratio = max(peaks.values()) / max(min(peaks.values()), 1)
+    print(f"Highest to lowest peak: {ratio:.2f} (tolerance {tolerance}).")
+    return ratio <= tolerance
+
+
+def check_parsers(fixtures_dir=None):
+    """
+    Compare the output of every parser backend with html.parser on the full document.
+
+    :param fixtures_dir: Recorded fixtures; by default the synthetic pages are checked.
+    :return: The number of words whose output differs, or that have a dictionary page but no entries.
+    """
+    if fixtures_dir is None:
+        with synthetic_fixtures() as synthetic_dir:
+            return check_parsers(synthetic_dir)
+
+    index = load_index(fixtures_dir)
+    failures = 0
+    for word, urls in index['words'].items():
+        pages = {source: read_fixture(fixtures_dir, url) for source, url in urls.items()
+                 if source != 'audio' and index['urls'][url] == 200}
+        results = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for parser, parse_only_subtrees in PARSER_BACKENDS:
+                parsing.HTML_PARSER, parsing.PARSE_ONLY_SUBTREES = parser, parse_only_subtrees
+                results[(parser, parse_only_subtrees)] = parse_pages(pages, word)
+        expected = results[PARSER_BACKENDS[0]]
+        if pages.get('meanings') and not expected[0]:
+            failures += 1
+            print(f"'{word}': no entries extracted from its dictionary page")
+        for backend, result in results.items():
+            if result != expected:
+                failures += 1
+                print(f"'{word}': {backend} differs from {PARSER_BACKENDS[0]}")
+    print(f"{len(index['words'])} words checked, {failures} failures.")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record_parser = subparsers.add_parser('record', help='Record fixtures for the words of a CSV file')
+    record_parser.add_argument('input_csv_path')
+    run_parser = subparsers.add_parser('run', help='Time every stage against the fixtures')
+    run_parser.add_argument('--words', type=int, default=None, help='Only use the first N recorded words')
+    run_parser.add_argument('--parser', default=None, help="HTML parser backend, e.g. 'lxml'")
+    run_parser.add_argument('--fixtures', default=FIXTURES_DIR, help='The directory of recorded fixtures')
+    check_parser = subparsers.add_parser('check-parsers', help='Check that all parser backends produce the same output')
+    check_parser.add_argument('--fixtures', default=None,
+                              help='A directory of recorded fixtures instead of the synthetic pages')
+    memory_parser = subparsers.add_parser('memory', help='Check that a bounded-memory build has a flat peak')
+    memory_parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 200, 400],
+                               help='The word counts to build')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(read_words(args.input_csv_path))
+    elif args.command == 'run':
+        run(args.words, args.parser, args.fixtures)
+    elif args.command == 'memory':
+        sys.exit(0 if memory(args.sizes) else 1)
+    else:
+        sys.exit(1 if check_parsers(args.fixtures) else 0)
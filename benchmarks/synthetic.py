@@ -0,0 +1,77 @@
+"""
+Synthetic fixtures: the page templates in benchmarks/pages filled in for made-up words, so the parser check and the
+memory benchmark run without recorded pages or network access. The templates carry the markup the scrappers read,
+Cambridge's 'pr dictionary' sections and collocation 'eg' blocks and Oxford's synonyms 'body', inside the kind of
+surrounding markup the live pages have.
+"""
+import contextlib
+import hashlib
+import os
+import tempfile
+from string import Template
+from urllib.parse import urljoin
+
+from benchmarks.replay import page_urls, save_fixture, save_index
+from src.scrappers import meanings
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+SOURCES = ('meanings', 'collocations', 'synonyms')
+# Where the meanings template points the pronunciation of a headword
+AUDIO_PATH = '/media/english/uk_pron/u/uk{headword}.mp3'
+
+# A headword, an inflected form listed under it, a word with no collocations or synonyms, and a word with no pages
+SAMPLE_WORDS = {
+    'bear': ('bear', SOURCES),
+    'bears': ('bear', SOURCES),
+    'bearable': ('bearable', ('meanings',)),
+    'missing': (None, ()),
+}
+
+
+def write_synthetic(fixtures_dir, words=SAMPLE_WORDS):
+    """
+    Write fixtures for made-up words in the format `record` uses.
+
+    :param words: Maps every word to its headword and the sources that have a page for it; the other sources
+                  answer 404. A list of words gives each one all three pages under its own name.
+    :return: The index, as load_index returns it.
+    """
+    if not isinstance(words, dict):
+        words = {word: (word, SOURCES) for word in words}
+    templates = {}
+    for source in SOURCES:
+        with open(os.path.join(PAGES_DIR, f"{source}.html"), encoding='utf-8') as template_file:
+            templates[source] = Template(template_file.read())
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+    index = {'words': {}, 'urls': {}}
+    for word, (headword, sources) in words.items():
+        urls = page_urls(word)
+        for source, url in urls.items():
+            if source in sources:
+                page = templates[source].safe_substitute(word=word, headword=headword)
+                save_fixture(fixtures_dir, url, page.encode('utf-8'))
+                index['urls'][url] = 200
+            else:
+                save_fixture(fixtures_dir, url, b'Not Found')
+                index['urls'][url] = 404
+        if 'meanings' in sources:
+            audio_url = urljoin(meanings.BASE_URL, AUDIO_PATH.format(headword=headword))
+            if audio_url not in index['urls']:
+                # A few KiB of bytes unique to the headword, so every file lands in the media store on its own
+                save_fixture(fixtures_dir, audio_url, b'ID3' + hashlib.sha1(headword.encode('utf-8')).digest() * 200)
+                index['urls'][audio_url] = 200
+            urls['audio'] = [audio_url]
+        index['words'][word] = urls
+    save_index(fixtures_dir, index)
+    return index
+
+
+@contextlib.contextmanager
+def synthetic_fixtures(words=SAMPLE_WORDS):
+    """
+    Write synthetic fixtures to a temporary directory and yield its path.
+    """
+    with tempfile.TemporaryDirectory() as fixtures_dir:
+        write_synthetic(fixtures_dir, words)
+        yield fixtures_dir
@@ -0,0 +1,234 @@
+"""
+Non-interactive entry point for building many decks in one process.
+
+    python cli.py build class-a.csv:"Class A" class-b.csv:"Class B" --output-dir decks
+    python cli.py prefetch class-a.csv class-b.csv
+    python cli.py select --level B2 --pos verb --deck "B2 verbs"
+    python cli.py queue enqueue big-list.csv --queue /shared/queue.sqlite3
+    python cli.py queue work --queue /shared/queue.sqlite3     (on every worker machine)
+    python cli.py queue merge --queue /shared/queue.sqlite3 --deck "Big list" --csv big-list-out.csv
+    python cli.py cache stats
+    python cli.py list --output-dir decks
+
+All decks of one `build` share the HTTP session, the rate controllers and the caches, so a word that appears in
+several lists is scraped once. The heavy modules are imported by the commands that need them, so quick commands
+such as `cache stats` start fast.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+
+def parse_list(value):
+    """
+    Split a `path:deck name` argument. Without a deck name the file name is used.
+    """
+    path, separator, deck_name = value.rpartition(':')
+    if not separator or not path or os.sep in deck_name:
+        path, deck_name = value, os.path.splitext(os.path.basename(value))[0]
+    if not os.path.exists(path):
+        raise argparse.ArgumentTypeError(f"File '{path}' does not exist.")
+    return path, deck_name
+
+
+def build(args):
+    from src.dataset.pipeline import build_deck
+    from src.instrumentation.metrics import metrics
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for input_csv_path, deck_name in args.lists:
+        output_root = os.path.join(args.output_dir, deck_name)
+        print(f"Building '{deck_name}' from '{input_csv_path}'.")
+        # Every deck reports its own timings and counters
+        metrics.reset()
+        build_deck(input_csv_path, deck_name, f"{output_root}.apkg",
+                   csv_output_path=f"{output_root}.csv" if args.csv else None,
+                   has_collocations=not args.no_collocations, has_synonyms=not args.no_synonyms,
+                   workers=args.workers, resume=args.csv and args.resume, incremental=args.incremental,
+                   refresh=args.refresh, use_async=args.use_async, parse_workers=args.parse_workers,
+                   shard_by=args.shard_by, max_notes=args.max_notes, group_forms=not args.no_group_forms,
+                   offline=args.offline, bounded_memory=args.bounded_memory)
+
+
+def prefetch(args):
+    from src.dataset.create_csv import read_words
+    from src.dataset.offline_store import prefetch as prefetch_words
+
+    words = (word for input_csv_path, _ in args.lists for word in read_words(input_csv_path))
+    prefetch_words(words, has_collocations=not args.no_collocations, has_synonyms=not args.no_synonyms,
+                   workers=args.workers, audio=not args.no_audio)
+
+
+def select(args):
+    if args.deck is None:
+        from src.dataset.offline_store import get_offline_store
+
+        for word in get_offline_store().query(args.levels, args.pos, args.lists):
+            print(word)
+        return
+
+    from src.dataset.pipeline import build_filtered_deck
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    build_filtered_deck(args.deck, os.path.join(args.output_dir, f"{args.deck}.apkg"), args.levels, args.pos,
+                        args.lists, has_collocations=not args.no_collocations, has_synonyms=not args.no_synonyms,
+                        shard_by=args.shard_by, max_notes=args.max_notes, bounded_memory=args.bounded_memory)
+
+
+def queue(args):
+    from src.dataset.work_queue import WorkQueue
+
+    work_queue = WorkQueue(args.queue)
+    if args.action == 'enqueue':
+        if not args.lists:
+            sys.exit("Give the word lists to enqueue.")
+        from src.dataset.create_csv import read_words
+
+        words = (word for input_csv_path, _ in args.lists for word in read_words(input_csv_path))
+        print(f"{work_queue.enqueue(words)} words queued.")
+    elif args.action == 'work':
+        from src.dataset.work_queue import run_worker
+
+        run_worker(work_queue, args.worker, not args.no_collocations, not args.no_synonyms, args.workers,
+                   args.batch_size, args.lease)
+    elif args.action == 'merge':
+        from src.dataset.work_queue import merge
+
+        merge(work_queue, args.csv, args.deck, shard_by=args.shard_by, max_notes=args.max_notes,
+              bounded_memory=args.bounded_memory)
+    else:
+        print(json.dumps(work_queue.status()))
+
+
+def _caches():
+    from src.dataset.offline_store import get_offline_store
+    from src.scrappers.entry_cache import get_entry_cache
+    from src.scrappers.http_cache import get_cache
+    from src.scrappers.media_store import get_media_store
+
+    return {'http': get_cache(), 'entries': get_entry_cache(), 'media': get_media_store(),
+            'offline': get_offline_store()}
+
+
+def cache(args):
+    caches = _caches()
+    unknown = set(args.names) - set(caches)
+    if unknown:
+        sys.exit(f"Unknown cache {', '.join(sorted(unknown))}, expected one of {', '.join(caches)}.")
+    if args.action == 'clear':
+        for name in args.names or ['http', 'entries']:
+            if not hasattr(caches[name], 'clear'):
+                sys.exit(f"The {name} store cannot be cleared from here.")
+            caches[name].clear()
+            print(f"Cleared the {name} cache.")
+        return
+    for name, store in caches.items():
+        if not args.names or name in args.names:
+            print(f"{name}: {json.dumps(store.stats())}")
+
+
+def list_decks(args):
+    for package in sorted(glob.glob(os.path.join(args.output_dir, '*.apkg'))):
+        manifest_path = f"{package}.manifest.json"
+        notes = ''
+        if os.path.exists(manifest_path):
+            with open(manifest_path, mode='r', encoding='utf-8') as manifest_file:
+                notes = f"{len(json.load(manifest_file)['notes'])} notes"
+        print(f"{package}  {os.path.getsize(package)} bytes  {notes}".rstrip())
+
+
+def create_parser():
+    from config.settings import CSV_WORKERS, WORK_QUEUE_BATCH_SIZE, WORK_QUEUE_LEASE_SECONDS, WORK_QUEUE_PATH
+
+    parser = argparse.ArgumentParser(description='Build Anki decks from Cambridge dictionary word lists.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scraping = argparse.ArgumentParser(add_help=False)
+    scraping.add_argument('lists', nargs='+', type=parse_list, metavar='CSV[:DECK]',
+                          help='A word list and the name of its deck, which defaults to the file name.')
+    scraping.add_argument('--workers', type=int, default=CSV_WORKERS, help='Words scraped concurrently.')
+    scraping.add_argument('--no-collocations', action='store_true', help='Leave collocations out of the cards.')
+    scraping.add_argument('--no-synonyms', action='store_true', help='Leave synonyms out of the cards.')
+
+    build_parser = commands.add_parser('build', parents=[scraping], help='Build a deck for every word list.')
+    build_parser.add_argument('--output-dir', default='.', help='Where the packages and CSVs are written.')
+    build_parser.add_argument('--no-csv', dest='csv', action='store_false',
+                              help='Do not write the CSV next to each deck; the build then cannot be resumed.')
+    build_parser.add_argument('--resume', action='store_true',
+                              help='Continue an interrupted build from the rows in its CSV.')
+    build_parser.add_argument('--incremental', action='store_true', help='Only package new or changed notes.')
+    build_parser.add_argument('--refresh', action='store_true',
+                              help='Re-scrape every word past the caches; with --incremental, only changed notes '
+                                   'are packaged. Implies not resuming.')
+    build_parser.add_argument('--async', dest='use_async', action='store_true', help='Scrape on an event loop.')
+    build_parser.add_argument('--parse-workers', type=int, default=0, help='Parse pages on this many processes.')
+    build_parser.add_argument('--shard-by', choices=['level', 'tag'], help='Package one sub-deck per level or tag.')
+    build_parser.add_argument('--max-notes', type=int, help='Split packages above this many notes.')
+    build_parser.add_argument('--no-group-forms', action='store_true',
+                              help='Scrape inflected forms separately instead of under their headword.')
+    build_parser.add_argument('--offline', action='store_true', help='Build from the offline store only.')
+    build_parser.add_argument('--bounded-memory', action='store_true',
+                              help='Keep memory flat on very long lists by packaging from a spill file.')
+    build_parser.set_defaults(func=build)
+
+    prefetch_parser = commands.add_parser('prefetch', parents=[scraping],
+                                          help='Scrape word lists into the offline store.')
+    prefetch_parser.add_argument('--no-audio', action='store_true', help='Do not download the pronunciations.')
+    prefetch_parser.set_defaults(func=prefetch)
+
+    select_parser = commands.add_parser('select', help='List or build a deck of the indexed words matching filters, '
+                                                       'without scraping.')
+    select_parser.add_argument('--level', dest='levels', action='append', help='A CEFR level; can be repeated.')
+    select_parser.add_argument('--pos', help="A part of speech such as 'verb'.")
+    select_parser.add_argument('--list', dest='lists', action='append',
+                               help='Only words built for this deck before; can be repeated.')
+    select_parser.add_argument('--deck', help='Build a deck of this name instead of printing the words.')
+    select_parser.add_argument('--output-dir', default='.')
+    select_parser.add_argument('--no-collocations', action='store_true')
+    select_parser.add_argument('--no-synonyms', action='store_true')
+    select_parser.add_argument('--shard-by', choices=['level', 'tag'])
+    select_parser.add_argument('--max-notes', type=int)
+    select_parser.add_argument('--bounded-memory', action='store_true')
+    select_parser.set_defaults(func=select)
+
+    queue_parser = commands.add_parser('queue', help='Split a big build across worker processes or machines that '
+                                                     'share a queue file.')
+    queue_parser.add_argument('action', choices=['enqueue', 'work', 'status', 'merge'])
+    queue_parser.add_argument('lists', nargs='*', type=parse_list, metavar='CSV', help='The word lists to enqueue.')
+    queue_parser.add_argument('--queue', default=WORK_QUEUE_PATH, help='The queue file shared by all workers.')
+    queue_parser.add_argument('--worker', help='The name of this worker, by default the host name and process id.')
+    queue_parser.add_argument('--workers', type=int, default=CSV_WORKERS, help='Words scraped concurrently.')
+    queue_parser.add_argument('--batch-size', type=int, default=WORK_QUEUE_BATCH_SIZE)
+    queue_parser.add_argument('--lease', type=float, default=WORK_QUEUE_LEASE_SECONDS,
+                              help='Seconds before a claimed batch is handed to another worker.')
+    queue_parser.add_argument('--no-collocations', action='store_true')
+    queue_parser.add_argument('--no-synonyms', action='store_true')
+    queue_parser.add_argument('--csv', help='merge: write the rows to this CSV.')
+    queue_parser.add_argument('--deck', help='merge: build a deck of this name.')
+    queue_parser.add_argument('--shard-by', choices=['level', 'tag'])
+    queue_parser.add_argument('--max-notes', type=int)
+    queue_parser.add_argument('--bounded-memory', action='store_true')
+    queue_parser.set_defaults(func=queue)
+
+    cache_parser = commands.add_parser('cache', help='Show or clear the caches.')
+    cache_parser.add_argument('action', choices=['stats', 'clear'])
+    cache_parser.add_argument('names', nargs='*', metavar='NAME',
+                              help='The caches to act on: http, entries, media or offline. All of them by default, '
+                                   'http and entries for clear.')
+    cache_parser.set_defaults(func=cache)
+
+    list_parser = commands.add_parser('list', help='List the built decks.')
+    list_parser.add_argument('--output-dir', default='.')
+    list_parser.set_defaults(func=list_decks)
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
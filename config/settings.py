@@ -5,3 +5,81 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_DIR = os.path.join(BASE_DIR, 'media')
 AUDIO_DIR = os.path.join(MEDIA_DIR, 'audio')
+# Maps headwords and source URLs to the content hash their audio is stored under in AUDIO_DIR
+MEDIA_INDEX_PATH = os.path.join(AUDIO_DIR, 'index.sqlite3')
+
+# HTTP client shared by all scrappers
+HTTP_POOL_CONNECTIONS = 4  # Number of hosts to keep a connection pool for
+HTTP_POOL_MAXSIZE = 10  # Keep-alive connections per host
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 1
+HTTP_RETRY_STATUSES = [403, 429, 500, 502, 503, 504]  # Also make the host's rate controller back off
+HTTP_TIMEOUT = 30  # Seconds
+
+# Politeness budget per host, in requests per second and burst size. The rate starts at 'rate' and adapts between
+# 'min_rate' and 'max_rate': it grows by RATE_INCREASE after every healthy response and is multiplied by
+# RATE_DECREASE whenever the host answers with one of HTTP_RETRY_STATUSES.
+HOST_RATE_LIMITS = {
+    'dictionary.cambridge.org': {'rate': 0.5, 'burst': 2, 'min_rate': 0.05, 'max_rate': 5},
+    'www.oxfordlearnersdictionaries.com': {'rate': 0.3, 'burst': 1, 'min_rate': 0.05, 'max_rate': 3},
+}
+DEFAULT_RATE_LIMIT = {'rate': 1, 'burst': 1, 'min_rate': 0.1, 'max_rate': 5}
+RATE_INCREASE = 0.05
+RATE_DECREASE = 0.5
+
+# Number of words processed at the same time by create_csv_file
+CSV_WORKERS = 4
+
+# On-disk cache of fetched pages
+CACHE_DIR = os.path.join(MEDIA_DIR, 'cache')
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_PATH = os.path.join(CACHE_DIR, 'http_cache.sqlite3')
+HTTP_CACHE_TTL = 30 * 24 * 60 * 60  # Seconds before a cached page is revalidated
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used pages are evicted above this size
+
+# Cache of the structured data extracted by the scrappers
+ENTRY_CACHE_ENABLED = True
+ENTRY_CACHE_PATH = os.path.join(CACHE_DIR, 'entries.sqlite3')
+NEGATIVE_CACHE_TTL = 7 * 24 * 60 * 60  # Seconds before a word a source had nothing for is requested again
+
+# Dictionary of prefetched words that decks can be built from without network access
+OFFLINE_STORE_PATH = os.path.join(MEDIA_DIR, 'offline.sqlite3')
+# Also keep every word scraped for a deck in it, indexed by level and part of speech
+WORD_INDEX_ENABLED = True
+
+# HTML parser used by BeautifulSoup: 'html.parser', or 'lxml' which is several times faster
+HTML_PARSER = 'html.parser'
+# Only build the parts of the page the scrappers read instead of the whole document
+PARSE_ONLY_SUBTREES = True
+
+# Number of audio files downloaded at the same time
+AUDIO_WORKERS = 4
+# Downloads queued at most per audio worker; submitting more waits for one to finish
+AUDIO_QUEUE_PER_WORKER = 4
+
+# Sockets shared by all requests in async mode
+ASYNC_MAX_CONNECTIONS = 10
+
+# Threads used to run the meanings, collocations and synonyms lookups of one word side by side
+LOOKUP_WORKERS = 8
+
+# Append per-stage timings and counters of every run as JSON lines to this file; None disables the log
+METRICS_LOG_PATH = None
+
+# Durations kept per stage for the percentiles of the metrics summary; longer runs keep a uniform sample of them
+METRICS_MAX_SAMPLES = 10000
+
+# Processes that parse the fetched pages when create_csv_file/build_deck run with parse_workers, and the number of
+# words sent to a process at once
+PARSE_WORKERS = os.cpu_count() or 1
+PARSE_CHUNK_SIZE = 16
+
+# Decks
+CEFR_LEVELS = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+SHARD_WORKERS = os.cpu_count() or 1
+
+# Work queue shared by the workers of a distributed build, see src/dataset/work_queue.py
+WORK_QUEUE_PATH = os.path.join(MEDIA_DIR, 'work_queue.sqlite3')
+WORK_QUEUE_BATCH_SIZE = 20  # Words claimed at once
+WORK_QUEUE_LEASE_SECONDS = 10 * 60  # A batch not finished within this time is handed to another worker
+WORK_QUEUE_MAX_ATTEMPTS = 3
@@ -1,35 +1,19 @@
-import csv
 import os
 
-from src.anki.ankideck_generator import create_anki_deck
-from src.dataset.create_csv import create_csv_file
+from config.settings import CSV_WORKERS
+from src.dataset.pipeline import build_deck
 
-# Path to the CSV file
-while True:
-    input_csv_path = input('Enter the csv file address:')
-    if os.path.exists(input_csv_path):
-        break
-    else:
-        print("File does not exist. Make sure you entered the correct path.")
-csv_file_path = 'output.csv'
-deck_name = input('Enter the name for you deck:')
+if __name__ == "__main__":
+    # Path to the CSV file
+    while True:
+        input_csv_path = input('Enter the csv file address:')
+        if os.path.exists(input_csv_path):
+            break
+        else:
+            print("File does not exist. Make sure you entered the correct path.")
+    deck_name = input('Enter the name for you deck:')
+    # Each deck keeps its own output; `python cli.py build ... --resume` continues an interrupted run of it
+    csv_file_path = f"{deck_name}.csv"
 
-create_csv_file(input_csv_path, csv_file_path, has_collocations=True, has_synonyms=True)
-
-# Initialize an empty list to store the records
-word_list = []
-
-# Read the CSV file
-with open(csv_file_path, mode='r', newline='', encoding='utf-8') as file:
-    reader = csv.DictReader(file)
-
-    # Iterate over each row in the CSV and add it to the list of records
-    for row in reader:
-        record = {
-            'word': row['word'],
-            'meaning': row['meaning'],
-            'tags': row['tags'].split(',')
-        }
-        word_list.append(record)
-
-create_anki_deck(deck_name, word_list, f"{deck_name}.apkg")
+    build_deck(input_csv_path, deck_name, f"{deck_name}.apkg", csv_output_path=csv_file_path, has_collocations=True,
+               has_synonyms=True, workers=CSV_WORKERS, resume=False, group_forms=True)
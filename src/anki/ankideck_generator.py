@@ -1,8 +1,12 @@
 import genanki
-import random
+import hashlib
+import json
 import os
+import tempfile
 
-from config.settings import AUDIO_DIR
+from src.html.html_generator import CARD_CSS
+from src.instrumentation.metrics import metrics
+from src.scrappers.media_store import get_media_store
 
 basic_model = genanki.Model(
     1431196525,
@@ -17,7 +21,8 @@ basic_model = genanki.Model(
             'qfmt': '{{Front}}',  # What appears on the front of the card
             'afmt': '{{FrontSide}}<hr id="answer">{{Back}}',  # What appears on the back of the card
         },
-    ]
+    ],
+    css=CARD_CSS
 )
 
 basic_model_audio = genanki.Model(
@@ -34,24 +39,86 @@ basic_model_audio = genanki.Model(
             'qfmt': '{{Front}}<br>{{Audio}}',  # Front of the card includes audio
             'afmt': '{{FrontSide}}<hr id="answer">{{Back}}',  # Back of the card
         },
-    ]
+    ],
+    css=CARD_CSS
 )
 
 models = {"basic_model": basic_model,
           "basic_model_audio": basic_model_audio}
 
 
-def create_anki_deck(deck_name, words_database, output_file, model_name="basic_model_audio"):
+def stable_id(name):
+    """
+    Derive a 32-bit id from a name, so the same deck gets the same id on every build.
+    """
+    return int(hashlib.sha1(name.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def note_guid(deck_name, word):
+    """
+    The GUID of a word's note. It does not depend on the card content, so Anki updates the note in place when a
+    rebuilt deck is imported.
+    """
+    return genanki.guid_for(deck_name, word)
+
+
+class SpilledNotes:
+    """
+    The notes of a deck, rebuilt one at a time from records spilled to a JSON lines file whenever they are iterated,
+    so only the note being written is in memory. genanki iterates the notes of a deck twice while packaging it.
+
+    The media files of the notes are collected in `audio_files` on the first pass.
+    """
+
+    def __init__(self, spill_path, model, guid_namespace):
+        self.spill_path = spill_path
+        self.model = model
+        self.guid_namespace = guid_namespace
+        self.audio_files = {}
+        self._passes = 0
+
+    def __iter__(self):
+        store = get_media_store()
+        first_pass = not self._passes
+        self._passes += 1
+        with open(self.spill_path, mode='r', encoding='utf-8') as spill:
+            for line in spill:
+                word, meaning, tags = json.loads(line)
+                digest = store.lookup(word)
+                if digest is not None:
+                    self.audio_files[digest] = store.path(digest)
+                elif first_pass:
+                    print(f"Audio file does not exist for {word}")
+                yield genanki.Note(
+                    model=self.model,
+                    fields=[word, meaning, f"[sound:{store.filename(digest)}]" if digest is not None else ''],
+                    tags=tags,
+                    guid=note_guid(self.guid_namespace, word)
+                )
+
+
+def create_anki_deck(deck_name, words_database, output_file, model_name="basic_model_audio", deck_id=None,
+                     guid_namespace=None, bounded_memory=False):
     """
     Create an Anki deck from a list of words and their meanings, including audio.
 
     Parameters:
     - deck_name: The name of the Anki deck.
-    - words_database: A list of dictionaries, each containing a 'word', 'meaning' in HTML format, and optional 'tags'.
+    - words_database: An iterable of dictionaries, each containing a 'word', 'meaning' in HTML format, and optional
+      'tags'. It is consumed once, so a generator streaming the records works.
     - output_file: The name of the output .apkg file.
+    - deck_id: Defaults to an id derived from the deck name.
+    - guid_namespace: The name note GUIDs are derived from. Defaults to the deck name; sub-decks pass their parent's
+      name so a note keeps its GUID whichever sub-deck it lands in.
+    - bounded_memory: Spill the records to a temporary file as they stream in and build the notes from it while
+      packaging, instead of holding every note in memory. The package is the same.
+
+    Returns the number of notes written. Without any notes no package is written, so an incremental build with
+    nothing new leaves the previous package in place.
     """
-    # Generate unique deck_id and model_id
-    deck_id = random.getrandbits(32)
+    # Derive a deck_id that stays the same across builds
+    if deck_id is None:
+        deck_id = stable_id(deck_name)
 
     # Use the pre-defined model
     model = models.get(model_name)
@@ -61,33 +128,83 @@ def create_anki_deck(deck_name, words_database, output_file, model_name="basic_m
         deck_id,
         deck_name)
 
+    if bounded_memory:
+        return _write_spilled_deck(my_deck, words_database, output_file, model, guid_namespace or deck_name)
+
     # Add notes (cards) to the deck
-    audio_files = []  # To collect all audio file paths for the package
+    notes = []
     for entry in words_database:
-        word = entry['word']
-        audio_filename = f"{word}.mp3"  # Only use the filename, not the full path
-        audio_file_path = os.path.join(AUDIO_DIR, audio_filename)  # Full path to check existence
-
-        # Check if audio file exists
-        if os.path.isfile(audio_file_path):
-            audio_field = f"[sound:{audio_filename}]"  # Anki format for audio
-            audio_files.append(audio_file_path)  # Add full path to the package list
-        else:
-            audio_field = ''  # No audio file available
-            print(f"Audio file does not exist for {word}")
-
         note = genanki.Note(
             model=model,
-            fields=[entry['word'], entry['meaning'], audio_field],
-            tags=entry.get('tags', [])  # Default to empty list if 'tags' not in entry
+            fields=[entry['word'], entry['meaning'], ''],
+            tags=entry.get('tags', []),  # Default to empty list if 'tags' not in entry
+            guid=note_guid(guid_namespace or deck_name, entry['word'])
         )  # The fields are [Front, Back, Audio]
         my_deck.add_note(note)
+        notes.append(note)
+
+    if not notes:
+        print(f"No notes to package, '{output_file}' is left as it is.")
+        return 0
+
+    # Attach the audio once all records are consumed, so downloads still running while the records were
+    # streamed in have finished
+    store = get_media_store()
+    audio_files = {}  # The media files of the package, each file once however many notes share it
+    for note in notes:
+        word = note.fields[0]
+        digest = store.lookup(word)
+        if digest is not None:
+            note.fields[2] = f"[sound:{store.filename(digest)}]"  # Anki format for audio
+            audio_files[digest] = store.path(digest)
+        else:
+            print(f"Audio file does not exist for {word}")
 
     # Save the deck to a file including media files
-    genanki.Package(my_deck, media_files=audio_files).write_to_file(output_file)
+    with metrics.timer('deck.package'):
+        genanki.Package(my_deck, media_files=list(audio_files.values())).write_to_file(output_file)
+    metrics.incr('deck.notes', len(notes))
+    metrics.incr('deck.media_files', len(audio_files))
+
+    _report(my_deck, model, output_file)
+    return len(notes)
 
+
+def _write_spilled_deck(deck, words_database, output_file, model, guid_namespace):
+    """
+    The bounded-memory path of create_anki_deck.
+    """
+    spill_fd, spill_path = tempfile.mkstemp(suffix='.jsonl', dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        count = 0
+        with os.fdopen(spill_fd, mode='w', encoding='utf-8') as spill:
+            for entry in words_database:
+                spill.write(json.dumps([entry['word'], entry['meaning'], entry.get('tags', [])],
+                                       ensure_ascii=False) + '\n')
+                count += 1
+        if not count:
+            print(f"No notes to package, '{output_file}' is left as it is.")
+            return 0
+
+        notes = SpilledNotes(spill_path, model, guid_namespace)
+        deck.notes = notes
+        package = genanki.Package(deck)
+        # Read after the notes are written, by which time the first pass has collected them
+        package.media_files = notes.audio_files.values()
+        with metrics.timer('deck.package'):
+            package.write_to_file(output_file)
+    finally:
+        os.remove(spill_path)
+    metrics.incr('deck.notes', count)
+    metrics.incr('deck.media_files', len(notes.audio_files))
+
+    _report(deck, model, output_file)
+    return count
+
+
+def _report(deck, model, output_file):
     print(f"Anki deck created: {output_file}")
-    print(f"Generated deck_id: {deck_id}")
+    print(f"Generated deck_id: {deck.deck_id}")
     print(f"Generated model_id: {model.model_id}")
 
 
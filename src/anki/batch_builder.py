@@ -0,0 +1,130 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from config.settings import CEFR_LEVELS, SHARD_WORKERS
+from src.anki.ankideck_generator import create_anki_deck
+from src.instrumentation.metrics import metrics
+from src.scrappers.media_store import set_media_store
+
+LEVEL_LABEL = re.compile(r'<span class="lv">([ABC][12])</span>')
+
+
+def record_level(record):
+    """
+    The CEFR level of a record. Records read back from a CSV have no level, so it is recovered from the level labels
+    of the card.
+    """
+    if record.get('level'):
+        return record['level']
+    levels = set(LEVEL_LABEL.findall(record['meaning']))
+    for level in CEFR_LEVELS:
+        if level in levels:
+            return level
+    return None
+
+
+def shard_key(record, shard_by):
+    """
+    The sub-deck a record belongs to: its CEFR level for shard_by='level', its first tag for shard_by='tag'.
+    """
+    if shard_by == 'level':
+        return record_level(record) or 'Unleveled'
+    if shard_by == 'tag':
+        return record['tags'][0] if record.get('tags') else 'Untagged'
+    if shard_by is None:
+        return None
+    raise ValueError(f"Unknown shard_by '{shard_by}', expected 'level' or 'tag'")
+
+
+def _read_shard(path):
+    with open(path, mode='r', encoding='utf-8') as shard_file:
+        for line in shard_file:
+            yield json.loads(line)
+
+
+def _init_shard_worker():
+    # A SQLite connection must not be used across fork(), so every worker opens its own media store
+    set_media_store(None)
+
+
+def _build_shard(deck_name, shard_path, output_file, guid_namespace, bounded_memory=False):
+    """
+    Package one part on a worker process.
+
+    :return: A tuple of the number of notes and the metrics of the part, which the parent merges into its own.
+    """
+    metrics.reset()
+    count = create_anki_deck(deck_name, _read_shard(shard_path), output_file, guid_namespace=guid_namespace,
+                             bounded_memory=bounded_memory)
+    return count, metrics.export()
+
+
+def _file_suffix(name):
+    return re.sub(r'[^\w-]+', '_', name).strip('_')
+
+
+def build_sharded_decks(deck_name, records, output_file, shard_by=None, max_notes=None, workers=SHARD_WORKERS,
+                        bounded_memory=False):
+    """
+    Split the records into sub-decks and package each of them into its own .apkg file, so a very large vocabulary
+    is not held in one deck and one package.
+
+    Records are grouped by shard_key into `{deck_name}::{key}` sub-decks, and a sub-deck with more than max_notes
+    records is split further into `::Part 1`, `::Part 2` and so on. The records are spilled to one temporary file per
+    part while they stream in, so memory does not grow with the vocabulary, and the parts are then packaged on
+    `workers` processes. Note GUIDs are derived from deck_name, so a note keeps its identity across sub-decks.
+
+    :param records: An iterable of records as yielded by generate_records; it is consumed once.
+    :param output_file: The package of sub-deck `key` is written next to it as `{root}-{key}.apkg`.
+    :param shard_by: 'level', 'tag' or None to split by size only.
+    :param max_notes: The maximum number of notes per package, or None for no limit.
+    :param bounded_memory: Package each part without holding its notes in memory, see create_anki_deck.
+    :return: A dict of output file to number of notes.
+    """
+    root, ext = os.path.splitext(output_file)
+    spill_dir = tempfile.mkdtemp(prefix='anki-shards-')
+    parts = {}  # (key, part number) -> [file, note count]
+    current_part = {}
+    try:
+        for record in records:
+            key = shard_key(record, shard_by)
+            part = current_part.get(key, 1)
+            if max_notes is not None and (key, part) in parts and parts[(key, part)][1] >= max_notes:
+                parts[(key, part)][0].close()
+                part += 1
+                current_part[key] = part
+            if (key, part) not in parts:
+                path = os.path.join(spill_dir, f"{len(parts)}.jsonl")
+                parts[(key, part)] = [open(path, mode='w', encoding='utf-8'), 0]
+            spill = parts[(key, part)]
+            spill[0].write(json.dumps(record, ensure_ascii=False) + '\n')
+            spill[1] += 1
+        for spill_file, _ in parts.values():
+            spill_file.close()
+
+        builds = []
+        for (key, part), (spill_file, _) in parts.items():
+            name_parts = [deck_name] + ([key] if key is not None else [])
+            if part > 1 or current_part.get(key, 1) > 1:
+                name_parts.append(f"Part {part}")
+            file_suffix = '-'.join(_file_suffix(name) for name in name_parts[1:])
+            builds.append(('::'.join(name_parts), spill_file.name,
+                           f"{root}-{file_suffix}{ext or '.apkg'}" if file_suffix else output_file))
+
+        with ProcessPoolExecutor(max_workers=max(workers, 1), initializer=_init_shard_worker) as executor:
+            futures = {sub_output: executor.submit(_build_shard, sub_deck, path, sub_output, deck_name,
+                                                          bounded_memory)
+                       for sub_deck, path, sub_output in builds}
+            counts = {}
+            for sub_output, future in futures.items():
+                counts[sub_output], worker_metrics = future.result()
+                metrics.merge(worker_metrics)
+            return counts
+    finally:
+        for spill_file, _ in parts.values():
+            spill_file.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
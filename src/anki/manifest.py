@@ -0,0 +1,48 @@
+import hashlib
+import json
+import os
+
+
+def record_hash(record):
+    """
+    Hash everything that ends up in a word's note.
+    """
+    content = json.dumps([record['word'], record['meaning'], sorted(record.get('tags', []))], ensure_ascii=False)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class DeckManifest:
+    """
+    Remembers the content hash of every note packaged for a deck, so later builds only package what changed.
+    Stored as JSON next to the .apkg file.
+    """
+
+    def __init__(self, path, notes=None):
+        self.path = path
+        self.notes = notes or {}
+
+    @classmethod
+    def for_deck(cls, output_file):
+        return cls.load(f"{output_file}.manifest.json")
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, mode='r', encoding='utf-8') as manifest_file:
+            return cls(path, json.load(manifest_file)['notes'])
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, mode='w', encoding='utf-8') as manifest_file:
+            json.dump({'notes': self.notes}, manifest_file, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+    def __contains__(self, word):
+        return word in self.notes
+
+    def is_changed(self, record):
+        return self.notes.get(record['word']) != record_hash(record)
+
+    def update(self, record):
+        self.notes[record['word']] = record_hash(record)
@@ -0,0 +1,142 @@
+import csv
+import json
+import os
+
+
+class CsvCheckpoint:
+    """
+    Writes the output CSV of create_csv_file together with a journal of completed words, so an interrupted run can
+    resume where it stopped.
+
+    Every row is flushed and then recorded in `{output_csv_path}.journal` with the file offset after it, and a run
+    that completes marks the journal as finished. On resume the output is truncated to the last journaled offset,
+    which drops a row that was only partly written, and the journaled words are skipped. A finished output is not
+    resumed but written anew, so later runs pick up changes of the input and of the scrappers. Words that fail are
+    listed in `{name}_failed.csv`, which can be used as the input of a later run.
+    """
+
+    def __init__(self, output_csv_path, resume=False, keep=None):
+        """
+        :param keep: An optional predicate on words. On resume, the rows of words it returns False for, e.g. words
+                     removed from the input list since, are dropped from the output and not skipped.
+        """
+        self.output_csv_path = output_csv_path
+        self.journal_path = f"{output_csv_path}.journal"
+        root, ext = os.path.splitext(output_csv_path)
+        self.failed_path = f"{root}_failed{ext or '.csv'}"
+        self.resume = resume
+        self.keep = keep
+        self.finished = False
+        self.completed = set()
+        self.resumed = frozenset()
+        self.failed = 0
+
+    def __enter__(self):
+        offset = self._load() if self.resume and os.path.exists(self.output_csv_path) else None
+        if offset is not None and not self.finished:
+            with open(self.output_csv_path, mode='r+b') as outfile:
+                outfile.truncate(offset)
+            if self.keep is not None and not all(self.keep(word) for word in self.completed):
+                self._compact()
+            self._outfile = open(self.output_csv_path, mode='a', newline='', encoding='utf-8')
+            self._journal = open(self.journal_path, mode='a', encoding='utf-8')
+            self._writer = csv.writer(self._outfile)
+        else:
+            if self.finished:
+                print(f"'{self.output_csv_path}' is complete, so it is written anew.")
+            self.completed.clear()
+            self._outfile = open(self.output_csv_path, mode='w', newline='', encoding='utf-8')
+            self._journal = open(self.journal_path, mode='w', encoding='utf-8')
+            self._writer = csv.writer(self._outfile)
+            # Write the new header with only "Word" and "Meaning" columns
+            self._writer.writerow(['word', 'meaning', 'tags'])
+            self._commit(None)
+        # Words written by earlier runs; words written by this run are not skipped, so duplicates in the input are
+        # handled the same however far ahead the words are read
+        self.resumed = frozenset(self.completed)
+        self._failed_file = open(self.failed_path, mode='w', newline='', encoding='utf-8')
+        self._failed_writer = csv.writer(self._failed_file)
+        self._failed_writer.writerow(['word', 'error'])
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._outfile.flush()
+            self._journal.write(json.dumps({'finished': True, 'offset': self._outfile.tell()}) + '\n')
+        self._outfile.close()
+        self._journal.close()
+        self._failed_file.close()
+        if not self.failed:
+            os.remove(self.failed_path)
+
+    def _load(self):
+        """
+        Read the completed words and return the offset the output is valid up to.
+        Outputs written without a journal are trusted as a whole.
+        """
+        if not os.path.exists(self.journal_path):
+            csv.field_size_limit(2 ** 31 - 1)
+            with open(self.output_csv_path, mode='r', newline='', encoding='utf-8') as infile:
+                self.completed.update(row['word'] for row in csv.DictReader(infile))
+            # Start a journal that trusts everything written so far
+            with open(self.journal_path, mode='w', encoding='utf-8') as journal:
+                journal.write(json.dumps({'offset': os.path.getsize(self.output_csv_path)}) + '\n')
+            return os.path.getsize(self.output_csv_path)
+
+        offset = 0
+        with open(self.journal_path, mode='r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line was cut off mid-write
+                    break
+                offset = record['offset']
+                if record.get('word') is not None:
+                    self.completed.add(record['word'])
+                self.finished = record.get('finished', False)
+        return offset
+
+    def _compact(self):
+        """
+        Rewrite the output and the journal with only the rows of the words `keep` accepts.
+        """
+        csv.field_size_limit(2 ** 31 - 1)
+        temp_path = f"{self.output_csv_path}.tmp"
+        self.completed.clear()
+        with open(self.output_csv_path, mode='r', newline='', encoding='utf-8') as infile, \
+                open(temp_path, mode='w', newline='', encoding='utf-8') as outfile, \
+                open(self.journal_path, mode='w', encoding='utf-8') as journal:
+            reader = csv.reader(infile)
+            writer = csv.writer(outfile)
+            for i, row in enumerate(reader):
+                word = row[0] if i else None
+                if word is not None and not self.keep(word):
+                    continue
+                writer.writerow(row)
+                outfile.flush()
+                journal.write(json.dumps({'word': word, 'offset': outfile.tell()}) + '\n')
+                if word is not None:
+                    self.completed.add(word)
+        os.replace(temp_path, self.output_csv_path)
+
+    def _commit(self, word):
+        self._outfile.flush()
+        self._journal.write(json.dumps({'word': word, 'offset': self._outfile.tell()}) + '\n')
+        self._journal.flush()
+
+    def is_done(self, word):
+        """
+        Whether an earlier run already wrote the word.
+        """
+        return word in self.resumed
+
+    def write(self, word, html_meaning, tags):
+        self._writer.writerow([word, html_meaning, ','.join(tags)])
+        self._commit(word)
+        self.completed.add(word)
+
+    def fail(self, word, error):
+        self._failed_writer.writerow([word, str(error)])
+        self._failed_file.flush()
+        self.failed += 1
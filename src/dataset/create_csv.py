@@ -1,61 +1,306 @@
+import asyncio
 import csv
-import random
-import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from src.scrappers.meanings import get_word_meanings
-from src.scrappers.collocations import get_collocations
+from config.settings import CEFR_LEVELS, LOOKUP_WORKERS
+from src.dataset.checkpoint import CsvCheckpoint
+from src.instrumentation.metrics import metrics
+from src.scrappers.audio import AudioDownloader
+from src.scrappers.rate_limit import rate_metrics
+from src.scrappers.meanings import get_word_meanings, get_word_meanings_async
+from src.scrappers.collocations import get_collocations, get_collocations_async
 from src.html.html_generator import generate_html_from_json
-from src.scrappers.synonyms import get_synonyms
+from src.scrappers.synonyms import get_synonyms, get_synonyms_async
 
 
-def create_csv_file(input_csv_path, output_csv_path, has_collocations=False, has_synonyms=False):
-    # Read the CSV file, apply the function, and write to a new CSV
-    with open(input_csv_path, mode='r') as infile, open(output_csv_path, mode='w', newline='') as outfile:
-        reader = csv.reader(infile)
-        writer = csv.writer(outfile)
+def get_tags(word_data):
+    """
+    Derive coarse part of speech tags and the CEFR levels of its meanings from the entries of a word.
+    """
+    tags = []
+    for dict_title, dict_body in word_data.items():
+        for entry in dict_body:
+            try:
+                if 'adjective' in entry['part_of_speech']:
+                    tags.append('adjective')
+                if 'adverb' in entry['part_of_speech']:
+                    tags.append('adverb')
+                if 'verb' in entry['part_of_speech']:
+                    if 'phrasal' in entry['part_of_speech']:
+                        tags.append('phrasal verb')
+                    tags.append('verb')
+            except Exception:
+                continue
+    tags.extend(get_levels(word_data))
+    return tags
+
+
+def get_levels(word_data):
+    """
+    Return the CEFR levels of the meanings of a word, lowest first.
+    """
+    levels = {meaning['level'] for dict_body in word_data.values() for entry in dict_body
+              for context in entry['contexts'] for meaning in context['meanings']}
+    return [level for level in CEFR_LEVELS if level in levels]
+
+
+def get_level(word_data):
+    """
+    Return the lowest CEFR level among the meanings of a word, or None if no meaning has one.
+    """
+    levels = get_levels(word_data)
+    return levels[0] if levels else None
+
+
+def render_word(word, word_data, collocations=None, synonyms=None, audio=None, index=True):
+    """
+    Queue the audio of a scraped word, add it to the word index and render its card.
+
+    :return: A tuple of (word, html_meaning, tags, level).
+    """
+    if audio is not None:
+        audio.submit_entries(word_data)
+    if index:
+        from src.dataset.offline_store import index_word
+        index_word(word, word_data, collocations, synonyms)
+    with metrics.timer('render', word):
+        html_meaning = generate_html_from_json(word_data, collocations, synonyms)
+    return word, html_meaning, get_tags(word_data), get_level(word_data)
+
+
+_lookup_executor = ThreadPoolExecutor(max_workers=LOOKUP_WORKERS, thread_name_prefix='lookup')
+
+
+def _optional_lookup(lookup, word):
+    try:
+        return lookup(word)
+    except Exception:
+        return None
+
+
+def process_word(word, has_collocations=False, has_synonyms=False, audio=None):
+    """
+    Scrape a single word and render its card.
+    The lookups hit different hosts and do not depend on each other, so they run side by side.
+
+    :param audio: An optional AudioDownloader that fetches the pronunciations in the background.
+    :return: A tuple of (word, html_meaning, tags, level).
+    """
+    with metrics.timer('word', word):
+        collocations_future = None
+        synonyms_future = None
+        if has_collocations:
+            collocations_future = _lookup_executor.submit(_optional_lookup, get_collocations, word)
+        if has_synonyms:
+            synonyms_future = _lookup_executor.submit(_optional_lookup, get_synonyms, word)
+        try:
+            with metrics.timer('lookup.meanings', word):
+                word_data = get_word_meanings(word)
+        finally:
+            with metrics.timer('lookup.join', word):
+                collocations = collocations_future.result() if collocations_future else None
+                synonyms = synonyms_future.result() if synonyms_future else None
+        return render_word(word, word_data, collocations, synonyms, audio)
+
+
+async def process_word_async(word, client, has_collocations=False, has_synonyms=False, audio=None):
+    """
+    The async counterpart of process_word: the lookups of the word run concurrently on the event loop.
+    """
+    async def optional(enabled, lookup):
+        if not enabled:
+            return None
+        try:
+            return await lookup(word, client)
+        except Exception:
+            return None
+
+    with metrics.timer('word', word):
+        word_data, collocations, synonyms = await asyncio.gather(
+            get_word_meanings_async(word, client),
+            optional(has_collocations, get_collocations_async),
+            optional(has_synonyms, get_synonyms_async))
+        return render_word(word, word_data, collocations, synonyms, audio)
+
+
+def ordered_async_map(func, items, concurrency):
+    """
+    Run the coroutine `func(item, client)` for every item on one event loop and yield the results in input order.
+    All coroutines share a single httpx client, and at most `concurrency` items are in flight.
+    """
+    from src.scrappers.async_client import create_async_client
+
+    loop = asyncio.new_event_loop()
+    client = create_async_client()
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(loop.create_task(func(item, client)))
+            if len(pending) >= concurrency:
+                yield loop.run_until_complete(pending.popleft())
+        while pending:
+            yield loop.run_until_complete(pending.popleft())
+    finally:
+        if pending:
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.wait(pending))
+        loop.run_until_complete(client.aclose())
+        loop.close()
 
-        # Write the new header with only "Word" and "Meaning" columns
-        writer.writerow(['word', 'meaning', 'tags'])
 
-        # Process each row
-        for i, row in enumerate(reader):
+def ordered_map(func, items, workers, executor_class=ThreadPoolExecutor):
+    """
+    Apply func to items on a thread pool (or another executor class) and yield the results in input order.
+    At most 2 * workers items are in flight, so items can be a lazy iterator.
+    """
+    with executor_class(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def prepare_words(words, workers=1, group_forms=False, skip=None, offline_store=None):
+    """
+    Deduplicate the input words and optionally group inflected forms under their headwords. The words are
+    consumed lazily.
+
+    :param skip: An optional predicate; words it returns True for are dropped, before and after grouping.
+    :param offline_store: Look the headwords up in this OfflineStore instead of online.
+    """
+    from src.dataset.preprocess import group_by_headword, resolve_headword, unique_words
+
+    words = unique_words(words)
+    if skip is not None:
+        words = (word for word in words if not skip(word))
+    if not group_forms:
+        return words
+    headwords = group_by_headword(words, workers, offline_store.headword if offline_store else resolve_headword)
+    return (headword for headword in headwords if skip is None or not skip(headword))
+
+
+def read_words(input_csv_path):
+    """
+    Yield the words in the first column of the input CSV, skipping the header and empty rows.
+    """
+    with open(input_csv_path, mode='r') as infile:
+        reader = csv.reader(infile)
+        for row in reader:
+            if not row:
+                continue
             word = row[0]  # The word is in the first column
             if word == 'word':
                 continue
-            word_data = get_word_meanings(word)
-            collocations = None
-            synonyms = None
-            if has_collocations:
-                try:
-                    collocations = get_collocations(word)
-                except Exception:
-                    collocations = None
-            if has_synonyms:
-                try:
-                    synonyms = get_synonyms(word)
-                except Exception:
-                    synonyms = None
-            html_meaning = generate_html_from_json(word_data, collocations, synonyms)
-            tags = []
-            # TODO: Add level of word to tags
-            for dict_title, dict_body in word_data.items():
-                for entry in dict_body:
-                    try:
-                        if 'adjective' in entry['part_of_speech']:
-                            tags.append('adjective')
-                        if 'adverb' in entry['part_of_speech']:
-                            tags.append('adverb')
-                        if 'verb' in entry['part_of_speech']:
-                            if 'phrasal' in entry['part_of_speech']:
-                                tags.append('phrasal verb')
-                            tags.append('verb')
-                    except Exception:
-                        continue
-            writer.writerow([word, html_meaning, ','.join(tags)])  # Write the updated row to the output CSV
-            # Random Interval
-            sleep_time = random.uniform(3, 7)  # random sleep time between 3 and 7 seconds
-            time.sleep(sleep_time)
-            print(f"{i}: word '{row[0]}' done.")
+            yield word
+
+
+def input_filter(input_csv_path):
+    """
+    Return a predicate telling whether a word is in the input CSV, ignoring case and spacing. Resumed runs keep only
+    the rows it accepts; a headword that is not in the input itself, e.g. 'bear' for 'bears', is scraped again.
+    """
+    from src.dataset.preprocess import normalize_word
+
+    words = {normalize_word(word) for word in read_words(input_csv_path)}
+    return lambda word: normalize_word(word) in words
+
+
+def generate_records(words, has_collocations=False, has_synonyms=False, workers=1, audio=None, on_error=None,
+                     use_async=False, parse_workers=0, offline_store=None):
+    """
+    Scrape the words and yield a record with the word, the HTML meaning, the tags and the CEFR level for each, in
+    input order.
+    A word that raises is skipped and passed to `on_error(word, error)` instead of aborting the batch.
+
+    :param words: An iterable of words; it is consumed lazily.
+    :param workers: Number of words processed concurrently. Requests are paced by the per-host rate controllers,
+                    not by fixed pauses.
+    :param audio: An optional AudioDownloader that fetches the pronunciations in the background.
+    :param use_async: Scrape on a single event loop instead of threads; workers is then the number of words in
+                      flight.
+    :param parse_workers: Fetch on `workers` threads but parse the pages on this many processes, see
+                          src/dataset/parse_pool.py.
+    :param offline_store: Render the words from this OfflineStore instead of scraping them, see
+                          src/dataset/offline_store.py.
+    """
+    def process(word):
+        try:
+            return process_word(word, has_collocations, has_synonyms, audio), None
+        except Exception as e:
+            return (word, None, None, None), e
+
+    async def process_async(word, client):
+        try:
+            return await process_word_async(word, client, has_collocations, has_synonyms, audio), None
+        except Exception as e:
+            return (word, None, None, None), e
+
+    def process_offline(word):
+        try:
+            return process_word_offline(word, offline_store, has_collocations, has_synonyms), None
+        except Exception as e:
+            return (word, None, None, None), e
+
+    if offline_store is not None:
+        from src.dataset.offline_store import process_word_offline
+        results = map(process_offline, words)
+    elif parse_workers > 0:
+        from src.dataset.parse_pool import process_words_in_pool
+        results = process_words_in_pool(words, has_collocations, has_synonyms, max(workers, 1), parse_workers, audio)
+    elif use_async:
+        results = ordered_async_map(process_async, words, max(workers, 1))
+    elif workers > 1:
+        results = ordered_map(process, words, workers)
+    else:
+        results = map(process, words)
+
+    # Process each row
+    for i, ((word, html_meaning, tags, level), error) in enumerate(results):
+        if error is not None:
+            metrics.event('words.failed', word=word, error=repr(error))
+            if on_error is not None:
+                on_error(word, error)
+            print(f"{i}: word '{word}' failed: {error}")
+            continue
+        metrics.incr('words.done')
+        print(f"{i}: word '{word}' done.")
+        yield {'word': word, 'meaning': html_meaning, 'tags': tags, 'level': level}
+
+
+def create_csv_file(input_csv_path, output_csv_path, has_collocations=False, has_synonyms=False, workers=1,
+                    resume=False, use_async=False, parse_workers=0, group_forms=False, offline=False):
+    """
+    Scrape every word of the input CSV and write word, meaning and tags rows to the output CSV.
+    A word that fails is recorded in the failed words list next to the output instead of aborting the run.
+
+    :param workers: Number of words processed concurrently, see generate_records.
+    :param resume: Keep the rows of an earlier, interrupted run of the same output whose words are still in the
+                   input, and skip their words. A run that completed is not resumed.
+    :param use_async: Scrape on a single event loop, see generate_records.
+    :param parse_workers: Parse on this many processes, see generate_records.
+    :param group_forms: Scrape inflected forms once under their headword, see prepare_words.
+    :param offline: Build from the offline store instead of the network, see src/dataset/offline_store.py.
+    """
+    offline_store = None
+    if offline:
+        from src.dataset.offline_store import OfflineStore
+        offline_store = OfflineStore()
+    # Read the CSV file, apply the function, and write to a new CSV
+    keep = input_filter(input_csv_path) if resume else None
+    with AudioDownloader() as audio, CsvCheckpoint(output_csv_path, resume, keep) as checkpoint:
+        words = prepare_words(read_words(input_csv_path), workers, group_forms, checkpoint.is_done, offline_store)
+        for record in generate_records(words, has_collocations, has_synonyms, workers, audio, checkpoint.fail,
+                                       use_async, parse_workers, offline_store):
+            checkpoint.write(record['word'], record['meaning'], record['tags'])  # Write the updated row
+
+    if checkpoint.failed:
+        print(f"{checkpoint.failed} words failed, see '{checkpoint.failed_path}'.")
+    metrics.report(rate_controllers=rate_metrics())
 
 
 if __name__ == "__main__":
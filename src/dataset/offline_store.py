@@ -0,0 +1,273 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from config.settings import CSV_WORKERS, OFFLINE_STORE_PATH, WORD_INDEX_ENABLED
+
+
+class OfflineStore:
+    """
+    A local SQLite dictionary of prefetched words, so decks can be built without any network access.
+
+    `words` holds the parsed entries, collocations, synonyms and audio reference of every prefetched word, and
+    `entries` one row per headword, dictionary, part of speech and CEFR level, indexed for queries such as all B2
+    verbs. `lists` records which decks each word was built for. Unless WORD_INDEX_ENABLED is off, every scraped word
+    is added as well, so slices of the vocabulary can be built later without scraping again.
+
+    Words keep the spelling they were stored with, and are looked up ignoring case.
+    """
+
+    def __init__(self, path=OFFLINE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS words (
+                    word TEXT PRIMARY KEY,
+                    headword TEXT NOT NULL,
+                    word_data TEXT NOT NULL,
+                    collocations TEXT,
+                    synonyms TEXT,
+                    audio_url TEXT,
+                    fetched_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS words_headword_nocase ON words (headword COLLATE NOCASE);
+                CREATE INDEX IF NOT EXISTS words_word_nocase ON words (word COLLATE NOCASE);
+                CREATE TABLE IF NOT EXISTS entries (
+                    word TEXT NOT NULL REFERENCES words (word),
+                    headword TEXT NOT NULL,
+                    dictionary TEXT NOT NULL,
+                    pos TEXT,
+                    level TEXT
+                );
+                CREATE INDEX IF NOT EXISTS entries_word ON entries (word);
+                CREATE INDEX IF NOT EXISTS entries_headword ON entries (headword);
+                CREATE INDEX IF NOT EXISTS entries_pos ON entries (pos);
+                CREATE INDEX IF NOT EXISTS entries_level ON entries (level);
+                CREATE TABLE IF NOT EXISTS lists (
+                    word TEXT NOT NULL,
+                    list_name TEXT NOT NULL,
+                    PRIMARY KEY (word, list_name)
+                );
+                CREATE INDEX IF NOT EXISTS lists_list_name ON lists (list_name);
+            """)
+            self._connection.commit()
+        return self._connection
+
+    def put(self, word, word_data, collocations=None, synonyms=None):
+        """
+        Store a scraped word. Collocations, synonyms or audio left out (None), e.g. by a build without them or a
+        lookup that failed, keep the stored ones.
+        """
+        from src.dataset.preprocess import headword_of
+
+        headword = headword_of(word_data) or word
+        audio_url = next((entry['audio_url'] for dict_body in word_data.values() for entry in dict_body
+                          if entry.get('audio_url')), None)
+        entries = set()
+        for dictionary, dict_body in word_data.items():
+            for entry in dict_body:
+                levels = {meaning['level'] for context in entry['contexts'] for meaning in context['meanings']}
+                for level in levels or {None}:
+                    entries.add((word, headword, dictionary, entry.get('part_of_speech'), level))
+        with self._lock:
+            connection = self._connect()
+            connection.execute("INSERT INTO words VALUES (?, ?, ?, ?, ?, ?, ?) "
+                               "ON CONFLICT (word) DO UPDATE SET headword = excluded.headword, "
+                               "word_data = excluded.word_data, "
+                               "collocations = COALESCE(excluded.collocations, collocations), "
+                               "synonyms = COALESCE(excluded.synonyms, synonyms), "
+                               "audio_url = COALESCE(excluded.audio_url, audio_url), "
+                               "fetched_at = excluded.fetched_at",
+                               (word, headword, json.dumps(word_data, ensure_ascii=False),
+                                json.dumps(collocations, ensure_ascii=False) if collocations is not None else None,
+                                json.dumps(synonyms, ensure_ascii=False) if synonyms is not None else None,
+                                audio_url, time.time()))
+            connection.execute("DELETE FROM entries WHERE word = ?", (word,))
+            connection.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?)", sorted(entries, key=str))
+            connection.commit()
+
+    def add_to_list(self, word, list_name):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("INSERT OR IGNORE INTO lists VALUES (?, ?)", (word, list_name))
+            connection.commit()
+
+    def query(self, levels=None, pos=None, lists=None, dictionary=None):
+        """
+        Return the stored words with an entry matching every given filter, in the order they were stored.
+
+        :param levels: CEFR levels, at least one meaning of the entry has to be at one of them.
+        :param pos: A part of speech such as 'verb'; it matches whole words, so 'verb' matches 'phrasal verb' but not
+                    'adverb'.
+        :param lists: Names of the decks the word was built for.
+        :param dictionary: The dictionary title of the entry.
+        """
+        conditions, params = [], []
+        if levels:
+            conditions.append(f"entries.level IN ({', '.join('?' * len(levels))})")
+            params.extend(levels)
+        if pos:
+            conditions.append("' ' || entries.pos || ' ' LIKE ?")
+            params.append(f"% {pos} %")
+        if dictionary:
+            conditions.append("entries.dictionary = ?")
+            params.append(dictionary)
+        if lists:
+            conditions.append(f"entries.word IN (SELECT word FROM lists WHERE list_name IN "
+                              f"({', '.join('?' * len(lists))}))")
+            params.extend(lists)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT words.word FROM words JOIN entries ON entries.word = words.word {where} "
+                f"GROUP BY words.word ORDER BY MIN(words.fetched_at)", params).fetchall()
+        return [row[0] for row in rows]
+
+    def get(self, word):
+        """
+        Return the (word_data, collocations, synonyms) of a word, looked up as prefetched or by its headword, or
+        None if the store does not have it.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT word_data, collocations, synonyms FROM words "
+                "WHERE word = ? COLLATE NOCASE OR headword = ? COLLATE NOCASE "
+                "ORDER BY word = ? DESC, word = ? COLLATE NOCASE DESC LIMIT 1", (word, word, word, word)).fetchone()
+        if row is None:
+            return None
+        return tuple(json.loads(column) if column is not None else None for column in row)
+
+    def headword(self, word):
+        """
+        Return the headword a prefetched word is listed under, or the word itself if it was not prefetched or is
+        its own headword.
+        """
+        from src.dataset.preprocess import normalize_word
+
+        with self._lock:
+            row = self._connect().execute("SELECT headword FROM words WHERE word = ? COLLATE NOCASE "
+                                          "ORDER BY word = ? DESC LIMIT 1", (word, word)).fetchone()
+        if row is None or normalize_word(row[0]) == normalize_word(word):
+            return word
+        return row[0]
+
+    def __contains__(self, word):
+        with self._lock:
+            row = self._connect().execute("SELECT 1 FROM words WHERE word = ? COLLATE NOCASE "
+                                          "OR headword = ? COLLATE NOCASE LIMIT 1", (word, word)).fetchone()
+        return row is not None
+
+    def stats(self):
+        with self._lock:
+            connection = self._connect()
+            words, headwords = connection.execute("SELECT COUNT(*), COUNT(DISTINCT headword) FROM words").fetchone()
+            entries = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lists = connection.execute("SELECT COUNT(DISTINCT list_name) FROM lists").fetchone()[0]
+        return {'words': words, 'headwords': headwords, 'entries': entries, 'lists': lists}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_offline_store():
+    """
+    Return the process-wide offline store, creating it on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = OfflineStore()
+    return _store
+
+
+def set_offline_store(store):
+    """
+    Replace the process-wide offline store. Passing None makes the next get_offline_store() call create a new one.
+    """
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def index_word(word, word_data, collocations=None, synonyms=None):
+    """
+    Add a freshly scraped word to the offline store, unless WORD_INDEX_ENABLED is off.
+    """
+    if WORD_INDEX_ENABLED:
+        get_offline_store().put(word, word_data, collocations, synonyms)
+
+
+def process_word_offline(word, store, has_collocations=False, has_synonyms=False):
+    """
+    The counterpart of process_word that renders a word from the offline store instead of scraping it.
+    Audio is not queued; prefetch already put it in the media store.
+    """
+    from src.dataset.create_csv import render_word
+    from src.scrappers.entry_cache import EntryNotFound
+
+    found = store.get(word)
+    if found is None:
+        raise EntryNotFound(f"'{word}' is not in the offline store '{store.path}'.")
+    word_data, collocations, synonyms = found
+    return render_word(word, word_data, collocations if has_collocations else None,
+                       synonyms if has_synonyms else None, index=False)
+
+
+def prefetch(words, store=None, has_collocations=True, has_synonyms=True, workers=CSV_WORKERS, audio=True):
+    """
+    Scrape the words into the offline store, along with their audio into the media store, so later builds can run
+    with offline=True.
+
+    :param words: An iterable of words; they are normalised and deduplicated first.
+    :param audio: Also download the pronunciations.
+    :return: The number of words stored.
+    """
+    # The scrappers are only needed here, so the store itself opens without importing them
+    from src.dataset.create_csv import _optional_lookup, ordered_map
+    from src.dataset.preprocess import unique_words
+    from src.scrappers.audio import AudioDownloader
+    from src.scrappers.collocations import get_collocations
+    from src.scrappers.meanings import get_word_meanings
+    from src.scrappers.synonyms import get_synonyms
+
+    store = store or get_offline_store()
+
+    def fetch_word(word):
+        try:
+            word_data = get_word_meanings(word)
+        except Exception as e:
+            return word, None, e
+        collocations = _optional_lookup(get_collocations, word) if has_collocations else None
+        synonyms = _optional_lookup(get_synonyms, word) if has_synonyms else None
+        return word, (word_data, collocations, synonyms), None
+
+    stored = 0
+    with AudioDownloader() as downloader:
+        for i, (word, found, error) in enumerate(ordered_map(fetch_word, unique_words(words), max(workers, 1))):
+            if error is not None:
+                print(f"{i}: word '{word}' failed: {error}")
+                continue
+            store.put(word, *found)
+            if audio:
+                downloader.submit_entries(found[0])
+            stored += 1
+            print(f"{i}: word '{word}' stored.")
+    print(f"{stored} words in the offline store '{store.path}'.")
+    return stored
+
+
+if __name__ == "__main__":
+    from src.dataset.create_csv import read_words
+
+    prefetch(read_words(sys.argv[1] if len(sys.argv) > 1 else 'sample.csv'))
@@ -0,0 +1,124 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from config.settings import PARSE_CHUNK_SIZE
+from src.dataset.create_csv import ordered_map, render_word
+from src.instrumentation.metrics import metrics
+from src.scrappers import collocations, meanings, synonyms
+from src.scrappers.entry_cache import load_entry, recall_miss, store_error, store_result
+
+# source -> (module, page fetcher, parser)
+SOURCES = {
+    'meanings': (meanings, meanings.fetch_meanings_page, lambda markup, word: meanings.parse_word_meanings(markup)),
+    'collocations': (collocations, collocations.fetch_collocations_page,
+                     lambda markup, word: collocations.parse_collocations(markup)),
+    'synonyms': (synonyms, synonyms.fetch_synonyms_page, synonyms.parse_synonyms),
+}
+
+
+def fetch_word_pages(word, sources):
+    """
+    Collect what is needed to scrape a word without parsing anything: cached data or known misses where the entry
+    cache has them, raw pages otherwise.
+
+    :return: A tuple of (word, results, pages, errors), each a dictionary keyed by source.
+    """
+    results, pages, errors = {}, {}, {}
+    for source in sources:
+        module, fetch_page, _ = SOURCES[source]
+        try:
+            data = recall_miss(source, word)
+        except Exception as e:
+            errors[source] = e
+            continue
+        if data is None:
+            data = load_entry(source, module.__name__, word)
+        if data is not None:
+            results[source] = data
+            continue
+        try:
+            markup = fetch_page(word)
+        except Exception as e:
+            store_error(source, word, e)
+            errors[source] = e
+            continue
+        if markup is None:
+            # The source has no page for this word
+            results[source] = []
+            store_result(source, module.__name__, word, [])
+        else:
+            pages[source] = markup
+    return word, results, pages, errors
+
+
+def parse_batch(batch):
+    """
+    Parse the pages of a batch of words. Runs in a worker process and only exchanges plain data.
+
+    :param batch: A list of (word, pages) tuples.
+    :return: A list of (results, errors) tuples in the same order.
+    """
+    parsed = []
+    for word, pages in batch:
+        results, errors = {}, {}
+        for source, markup in pages.items():
+            try:
+                results[source] = SOURCES[source][2](markup, word)
+            except Exception as e:
+                errors[source] = e
+        parsed.append((results, errors))
+    return parsed
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def process_words_in_pool(words, has_collocations=False, has_synonyms=False, fetch_workers=1, parse_workers=1,
+                          audio=None, chunk_size=PARSE_CHUNK_SIZE):
+    """
+    Scrape words with fetching and parsing split: pages are downloaded on `fetch_workers` threads and parsed in
+    chunks of `chunk_size` words on `parse_workers` processes, so the CPU-bound BeautifulSoup work uses all cores.
+    The output matches process_word for every word.
+
+    :return: A generator of ((word, html_meaning, tags, level), error) tuples in input order, like the other modes of
+             generate_records.
+    """
+    sources = ['meanings']
+    if has_collocations:
+        sources.append('collocations')
+    if has_synonyms:
+        sources.append('synonyms')
+
+    fetched = ordered_map(partial(fetch_word_pages, sources=sources), words, fetch_workers)
+    # Only the raw pages travel to the workers; the rest of each batch waits here in the same order
+    waiting = deque()
+
+    def payloads():
+        for batch in _chunks(fetched, chunk_size):
+            waiting.append(batch)
+            yield [(word, pages) for word, _, pages, _ in batch]
+
+    for parsed_batch in ordered_map(parse_batch, payloads(), parse_workers, ProcessPoolExecutor):
+        metrics.incr('parse_pool.batches')
+        for (word, results, pages, errors), (parsed, parse_errors) in zip(waiting.popleft(), parsed_batch):
+            for source, data in parsed.items():
+                store_result(source, SOURCES[source][0].__name__, word, data)
+            for source, error in parse_errors.items():
+                store_error(source, word, error)
+            results.update(parsed)
+            errors.update(parse_errors)
+            if 'meanings' in errors:
+                yield (word, None, None, None), errors['meanings']
+                continue
+            # Collocations and synonyms are optional, a failure leaves them out of the card
+            yield render_word(word, results['meanings'], results.get('collocations'), results.get('synonyms'),
+                              audio), None
@@ -0,0 +1,200 @@
+import contextlib
+import csv
+import time
+
+from config.settings import SHARD_WORKERS, WORD_INDEX_ENABLED
+from src.anki.ankideck_generator import create_anki_deck
+from src.anki.batch_builder import build_sharded_decks
+from src.anki.manifest import DeckManifest
+from src.dataset.checkpoint import CsvCheckpoint
+from src.dataset.create_csv import generate_records, input_filter, prepare_words, read_words
+from src.dataset.offline_store import get_offline_store
+from src.instrumentation.metrics import metrics
+from src.scrappers.audio import AudioDownloader
+from src.scrappers.entry_cache import get_entry_cache
+from src.scrappers.http_cache import get_cache
+from src.scrappers.rate_limit import rate_metrics
+
+
+def read_records(csv_path):
+    """
+    Yield the records of a CSV written by create_csv_file one at a time.
+    """
+    # The meaning column holds whole HTML cards
+    csv.field_size_limit(2 ** 31 - 1)
+    with open(csv_path, mode='r', newline='', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield {
+                'word': row['word'],
+                'meaning': row['meaning'],
+                'tags': row['tags'].split(',') if row['tags'] else []
+            }
+
+
+def stream_records(input_csv_path, has_collocations=True, has_synonyms=True, workers=1, audio=None,
+                   checkpoint=None, skip=None, use_async=False, parse_workers=0, group_forms=False, offline_store=None):
+    """
+    Yield the records of every word in the input CSV as soon as it is scraped and rendered.
+
+    :param checkpoint: An optional open CsvCheckpoint. Its already completed rows are yielded first, new rows are
+                       written to it as a side output and failed words are recorded in it.
+    :param skip: An optional predicate; words it returns True for are not scraped.
+    :param use_async: Scrape on a single event loop, see generate_records.
+    :param parse_workers: Parse on this many processes, see generate_records.
+    :param group_forms: Scrape inflected forms once under their headword, see prepare_words.
+    :param offline_store: Render the words from this OfflineStore instead of scraping them.
+    """
+    on_error = None
+    skipped = skip
+    if checkpoint is not None:
+        on_error = checkpoint.fail
+        if checkpoint.resumed:
+            yield from read_records(checkpoint.output_csv_path)
+        skipped = checkpoint.is_done if skip is None else lambda word: skip(word) or checkpoint.is_done(word)
+    words = prepare_words(read_words(input_csv_path), workers, group_forms, skipped, offline_store)
+
+    for record in generate_records(words, has_collocations, has_synonyms, workers, audio, on_error, use_async,
+                                   parse_workers, offline_store):
+        if checkpoint is not None:
+            checkpoint.write(record['word'], record['meaning'], record['tags'])
+        yield record
+
+    # The deck is packaged after the last record, so make sure its audio is on disk by then
+    if audio is not None:
+        audio.wait()
+
+
+def changed_records(records, manifest):
+    """
+    Pass through only the records whose content differs from what the manifest recorded, and record them.
+    """
+    for record in records:
+        if manifest.is_changed(record):
+            manifest.update(record)
+            yield record
+
+
+def build_deck(input_csv_path, deck_name, output_file, csv_output_path=None, has_collocations=True,
+               has_synonyms=True, workers=1, resume=False, incremental=False, refresh=False, use_async=False,
+               parse_workers=0, shard_by=None, max_notes=None, shard_workers=SHARD_WORKERS, group_forms=False,
+               offline=False, bounded_memory=False):
+    """
+    Scrape the words of the input CSV and stream the cards straight into an Anki deck.
+
+    :param csv_output_path: Optionally also write the rows to this CSV, which makes the build resumable.
+    :param resume: Reuse the rows of an earlier, interrupted build with the same csv_output_path whose words are
+                   still in the input. A build that completed is not resumed.
+    :param incremental: Only package notes that are new or changed since the last build of output_file, as tracked
+                        in its manifest. Deck and note ids are stable, so importing the package updates the existing
+                        deck in place.
+    :param refresh: Re-scrape every word, revalidating cached pages and ignoring cached entries, to pick up changed
+                    content. Otherwise incremental builds only scrape new words. A refresh never resumes, as the rows
+                    of the earlier build are what it replaces.
+    :param use_async: Scrape on a single event loop, see generate_records.
+    :param parse_workers: Parse on this many processes, see generate_records.
+    :param shard_by: Split the deck into one sub-deck and package per CEFR level ('level') or first tag ('tag'), see
+                     build_sharded_decks.
+    :param max_notes: Split the deck, or each sub-deck, into packages of at most this many notes.
+    :param shard_workers: Number of processes packaging the sub-decks.
+    :param group_forms: Scrape inflected forms once under their headword, see prepare_words.
+    :param offline: Build from the offline store filled by prefetch instead of the network, see
+                    src/dataset/offline_store.py.
+    :param bounded_memory: Keep memory flat however long the word list is: records pass through one at a time and
+                           the package is written without holding its notes, see create_anki_deck. Parse trees are
+                           freed after every page in either mode.
+    """
+    resume = resume and not refresh
+    offline_store = get_offline_store() if offline else None
+    manifest = DeckManifest.for_deck(output_file) if incremental else None
+    skip = manifest.__contains__ if incremental and not refresh else None
+
+    with _refreshing(refresh), AudioDownloader() as audio:
+        if csv_output_path is None:
+            records = stream_records(input_csv_path, has_collocations, has_synonyms, workers, audio, skip=skip,
+                                     use_async=use_async, parse_workers=parse_workers, group_forms=group_forms,
+                                     offline_store=offline_store)
+            note_count = package(deck_name, _track(_index_list(records, deck_name), manifest), output_file, shard_by,
+                                 max_notes, shard_workers, bounded_memory)
+        else:
+            keep = input_filter(input_csv_path) if resume else None
+            with CsvCheckpoint(csv_output_path, resume, keep) as checkpoint:
+                records = stream_records(input_csv_path, has_collocations, has_synonyms, workers, audio, checkpoint,
+                                         skip, use_async, parse_workers, group_forms, offline_store)
+                note_count = package(deck_name, _track(_index_list(records, deck_name), manifest), output_file,
+                                     shard_by, max_notes, shard_workers, bounded_memory)
+            if checkpoint.failed:
+                print(f"{checkpoint.failed} words failed, see '{checkpoint.failed_path}'.")
+
+    if manifest is not None:
+        manifest.save()
+        print(f"{note_count} new or changed notes packaged.")
+    metrics.report(rate_controllers=rate_metrics())
+
+
+def build_filtered_deck(deck_name, output_file, levels=None, pos=None, lists=None, has_collocations=True,
+                        has_synonyms=True, shard_by=None, max_notes=None, shard_workers=SHARD_WORKERS,
+                        bounded_memory=False):
+    """
+    Build a deck of the words in the offline store that match a query, e.g. all B2 verbs across the lists, straight
+    from the stored data without scraping. See OfflineStore.query for the filters.
+
+    :return: The number of notes packaged.
+    """
+    store = get_offline_store()
+    words = store.query(levels, pos, lists)
+    print(f"{len(words)} words match.")
+    records = generate_records(words, has_collocations, has_synonyms, offline_store=store)
+    note_count = package(deck_name, records, output_file, shard_by, max_notes, shard_workers, bounded_memory)
+    metrics.report()
+    return note_count
+
+
+def package(deck_name, records, output_file, shard_by=None, max_notes=None, shard_workers=SHARD_WORKERS,
+            bounded_memory=False):
+    """
+    Package the records into one deck, or into sub-decks when shard_by or max_notes is given.
+
+    :param bounded_memory: Package without holding the notes in memory, see create_anki_deck.
+    :return: The number of notes packaged.
+    """
+    if shard_by is None and max_notes is None:
+        return create_anki_deck(deck_name, records, output_file, bounded_memory=bounded_memory)
+    packages = build_sharded_decks(deck_name, records, output_file, shard_by, max_notes, shard_workers,
+                                   bounded_memory)
+    for package_file, count in packages.items():
+        print(f"{package_file}: {count} notes")
+    return sum(packages.values())
+
+
+@contextlib.contextmanager
+def _refreshing(refresh):
+    """
+    While refreshing, make the HTTP and entry caches disregard everything stored before the build started.
+    """
+    if not refresh:
+        yield
+        return
+    caches = (get_cache(), get_entry_cache())
+    saved = [cache.refresh_after for cache in caches]
+    for cache in caches:
+        cache.refresh_after = time.time()
+    try:
+        yield
+    finally:
+        for cache, refresh_after in zip(caches, saved):
+            cache.refresh_after = refresh_after
+
+
+def _track(records, manifest):
+    return records if manifest is None else changed_records(records, manifest)
+
+
+def _index_list(records, list_name):
+    """
+    Record in the word index that the records belong to the list.
+    """
+    for record in records:
+        if WORD_INDEX_ENABLED:
+            get_offline_store().add_to_list(record['word'], list_name)
+        yield record
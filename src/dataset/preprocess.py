@@ -0,0 +1,75 @@
+def normalize_word(word):
+    """
+    Fold case and collapse whitespace, so 'Bear', ' bear ' and 'bear' are looked up once.
+    """
+    return ' '.join(word.split()).casefold()
+
+
+def unique_words(words):
+    """
+    Yield the words in input order, dropping blanks and repeats. Words count as repeats when their normalised forms
+    match; the spelling of the first one is kept, with its whitespace collapsed. The words are consumed lazily.
+    """
+    seen = set()
+    for word in words:
+        word = ' '.join(word.split())
+        key = normalize_word(word)
+        if key and key not in seen:
+            seen.add(key)
+            yield word
+
+
+def headword_of(word_data):
+    """
+    Return the headword of the first entry in the output of get_word_meanings as Cambridge spells it, or None.
+    """
+    for dict_body in word_data.values():
+        for entry in dict_body:
+            if entry.get('word'):
+                return ' '.join(entry['word'].split())
+    return None
+
+
+def resolve_headword(word):
+    """
+    Look a word up and return the Cambridge headword it is listed under, e.g. 'bear' for 'bears'.
+    The page of an inflected form shows the entries of its headword, so they are kept in the entry cache under the
+    headword as well and scraping the headword afterwards needs no request. A word that cannot be looked up is its
+    own headword; scraping it later records the failure.
+    """
+    from src.scrappers.entry_cache import store_entry
+    from src.scrappers.meanings import get_word_meanings
+
+    try:
+        word_data = get_word_meanings(word)
+    except Exception:
+        return word
+    headword = headword_of(word_data) or word
+    if normalize_word(headword) == normalize_word(word):
+        # Keep the spelling of the input
+        return word
+    store_entry('meanings', get_word_meanings.__module__, headword, word_data)
+    return headword
+
+
+def group_by_headword(words, workers=1, resolve=resolve_headword):
+    """
+    Yield the headword of every word the first time it comes up, so inflected forms and the headword itself are
+    scraped only once. Headwords are resolved while the words stream through, so the first ones can be scraped
+    before the rest of the list is looked up.
+
+    :param words: An iterable of unique words, see unique_words.
+    :param workers: Number of words looked up concurrently.
+    :param resolve: A function returning the headword of a word, resolve_headword by default.
+    """
+    from src.dataset.create_csv import ordered_map
+
+    seen = set()
+    count = 0
+    for count, headword in enumerate(ordered_map(resolve, words, workers) if workers > 1 else map(resolve, words), 1):
+        key = normalize_word(headword)
+        if key not in seen:
+            seen.add(key)
+            yield headword
+    if len(seen) < count:
+        print(f"{count} words grouped under {len(seen)} headwords.")
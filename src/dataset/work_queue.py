@@ -0,0 +1,232 @@
+import csv
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from config.settings import (CSV_WORKERS, WORK_QUEUE_BATCH_SIZE, WORK_QUEUE_LEASE_SECONDS, WORK_QUEUE_MAX_ATTEMPTS,
+                             WORK_QUEUE_PATH)
+
+
+class WorkQueue:
+    """
+    A queue of words in a SQLite file that several workers, on one machine or on several sharing the file, scrape
+    together.
+
+    Workers claim batches of pending words under a lease. A word whose lease expired before its result was posted,
+    e.g. because its worker died, is handed out again, and a word that failed WORK_QUEUE_MAX_ATTEMPTS times is given
+    up. Results are kept with the position of the word in the input, so merging them restores the input order.
+    """
+
+    def __init__(self, path=WORK_QUEUE_PATH, max_attempts=WORK_QUEUE_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit mode, so claim() can hold a write lock across its select and update
+            self._connection = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    position INTEGER PRIMARY KEY,
+                    word TEXT NOT NULL UNIQUE,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    record TEXT,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, position);
+                CREATE TABLE IF NOT EXISTS audio (
+                    word TEXT PRIMARY KEY,
+                    url TEXT NOT NULL
+                );
+            """)
+        return self._connection
+
+    def enqueue(self, words):
+        """
+        Append the words to the queue after normalising them; words already queued are ignored.
+
+        :return: The number of words added.
+        """
+        from src.dataset.preprocess import unique_words
+
+        with self._lock:
+            connection = self._connect()
+            before = connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany("INSERT OR IGNORE INTO tasks (word) VALUES (?)",
+                                   ((word,) for word in unique_words(words)))
+            connection.execute("COMMIT")
+            return connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] - before
+
+    def claim(self, worker, batch_size=WORK_QUEUE_BATCH_SIZE, lease_seconds=WORK_QUEUE_LEASE_SECONDS):
+        """
+        Lease up to batch_size words to a worker, pending ones and ones whose lease expired, in input order.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Words whose workers kept dying on them are given up like words that kept failing
+                connection.execute(
+                    "UPDATE tasks SET status = 'failed', error = 'The lease expired ' || attempts || ' times.' "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, self.max_attempts))
+                rows = connection.execute(
+                    "SELECT position, word FROM tasks WHERE status = 'pending' "
+                    "OR (status = 'leased' AND lease_expires < ?) ORDER BY position LIMIT ?",
+                    (now, batch_size)).fetchall()
+                connection.executemany(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE position = ?", ((worker, now + lease_seconds, position) for position, _ in rows))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return [word for _, word in rows]
+
+    def complete(self, word, record):
+        """
+        Post the result of a word. A late result from a worker whose lease expired is still accepted.
+        """
+        with self._lock:
+            self._connect().execute(
+                "UPDATE tasks SET status = 'done', record = ?, error = NULL, lease_expires = NULL WHERE word = ?",
+                (json.dumps(record, ensure_ascii=False), word))
+
+    def fail(self, word, error):
+        """
+        Put a failed word back in the queue, or give it up after max_attempts attempts.
+        """
+        with self._lock:
+            self._connect().execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, "
+                "lease_expires = NULL WHERE word = ? AND status != 'done'", (self.max_attempts, str(error), word))
+
+    def add_audio(self, word, url):
+        with self._lock:
+            self._connect().execute("INSERT OR IGNORE INTO audio VALUES (?, ?)", (word, url))
+
+    def audio(self):
+        with self._lock:
+            return self._connect().execute("SELECT word, url FROM audio").fetchall()
+
+    def status(self):
+        """
+        Return the number of words per status.
+        """
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0, **dict(rows)}
+
+    def is_finished(self):
+        status = self.status()
+        return not status['pending'] and not status['leased']
+
+    def records(self):
+        """
+        Yield the records of the finished words in input order, reading a page of them at a time.
+        """
+        position = 0
+        while True:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT position, record FROM tasks WHERE status = 'done' AND position > ? "
+                    "ORDER BY position LIMIT 500", (position,)).fetchall()
+            if not rows:
+                return
+            for position, record in rows:
+                yield json.loads(record)
+
+    def failed(self):
+        with self._lock:
+            return self._connect().execute(
+                "SELECT word, error FROM tasks WHERE status = 'failed' ORDER BY position").fetchall()
+
+
+class _AudioCollector:
+    """
+    Stands in for an AudioDownloader on a worker and records the pronunciations in the queue instead, so the merge
+    downloads them on the machine that packages the deck.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def submit_entries(self, word_data):
+        for dict_body in word_data.values():
+            for entry in dict_body:
+                if entry.get('audio_url'):
+                    self.queue.add_audio(entry['word'], entry['audio_url'])
+
+
+def run_worker(queue, worker=None, has_collocations=True, has_synonyms=True, workers=CSV_WORKERS,
+               batch_size=WORK_QUEUE_BATCH_SIZE, lease_seconds=WORK_QUEUE_LEASE_SECONDS, poll_seconds=5):
+    """
+    Claim, scrape and post words until the queue is finished. When only words leased by other workers are left,
+    wait for them, as their leases may expire and be handed out here.
+
+    :param queue: A WorkQueue.
+    :param worker: The name leases are taken under, by default the host name and process id.
+    :param workers: Number of words scraped concurrently, see generate_records.
+    :param lease_seconds: How long a claimed batch stays with this worker; it has to cover scraping a whole batch.
+    :return: The number of words this worker finished.
+    """
+    from src.dataset.create_csv import generate_records
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    audio = _AudioCollector(queue)
+    finished = 0
+    while True:
+        words = queue.claim(worker, batch_size, lease_seconds)
+        if not words:
+            if queue.is_finished():
+                break
+            time.sleep(poll_seconds)
+            continue
+        for record in generate_records(words, has_collocations, has_synonyms, workers, audio, queue.fail):
+            queue.complete(record['word'], record)
+            finished += 1
+    print(f"Worker '{worker}' finished {finished} words, queue status: {queue.status()}.")
+    return finished
+
+
+def merge(queue, output_csv_path=None, deck_name=None, output_file=None, shard_by=None, max_notes=None,
+          bounded_memory=False):
+    """
+    Write the results of the queue, in input order, to a CSV and/or an Anki deck. Pronunciations recorded by the
+    workers are downloaded first, so the deck includes them.
+
+    :return: The number of records merged.
+    """
+    if not queue.is_finished():
+        print(f"The queue is not finished yet ({queue.status()}); only the finished words are merged.")
+    count = 0
+    if output_csv_path is not None:
+        with open(output_csv_path, mode='w', newline='', encoding='utf-8') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(['word', 'meaning', 'tags'])
+            for record in queue.records():
+                writer.writerow([record['word'], record['meaning'], ','.join(record['tags'])])
+                count += 1
+    if deck_name is not None:
+        from src.dataset.pipeline import package
+        from src.scrappers.audio import AudioDownloader
+
+        with AudioDownloader() as audio:
+            for word, url in queue.audio():
+                audio.submit(word, url)
+        count = package(deck_name, queue.records(), output_file or f"{deck_name}.apkg", shard_by, max_notes,
+                        bounded_memory=bounded_memory)
+    failed = queue.failed()
+    if failed:
+        print(f"{len(failed)} words failed, e.g. '{failed[0][0]}': {failed[0][1]}")
+    return count
@@ -1,87 +1,89 @@
-import json
+# Styles shared by every card. They live on the note model (see src/anki/ankideck_generator.py) so each note only
+# carries short class names instead of repeating inline styles.
+CARD_CSS = """
+.card { font-family: arial; font-size: 20px; text-align: center; color: black; background-color: white; }
+.dh { background-color: #FFCC00; padding: 10px; font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; color: #1d2a57; }
+.eh { border: 1px solid gray; opacity: 0.5; }
+.hw { font-size: 24px; font-weight: bold; }
+.ps { font-style: italic; color: #555; }
+.ph { color: #3949ab; }
+.ch { border: 2px solid #5d2fc1; }
+.ct { font-weight: bold; color: #5d2fc1; }
+.cx { margin-bottom: 20px; }
+.mh { border: 1px solid #fec400; }
+.lv { background-color: #3949ab; color: white; padding: 3px; border-radius: 5px; }
+.xi { color: #4C6D91; }
+.mi { text-align: left; }
+.mn { text-align: left; font-weight: bold; margin-top: 5px; }
+.ex { text-align: left; margin-left: 20px; font-style: italic; margin-top: 5px; }
+"""
+
+DICTIONARY_HEADER = '<div class="dh">{title}</div>'
+ENTRY_HEADER = ('<hr class="eh"/><div class="hw">{word}</div>'
+                '<div class="ps"><span>{part_of_speech}</span><br/><span class="ph">UK {phonetic}</span></div>')
+CONTEXT_TITLE = '<hr class="ch"/><span class="ct">{title}</span>'
+MEANING = ('<hr class="mh"/><div class="mi"><span class="lv">{level}</span> <span class="xi">{extra_info}</span></div>'
+           '<div class="mn">{meaning}</div>')
+EXAMPLE = '<div class="ex">• {example}</div>'
+COLLOCATION = '<li><strong>{collocation}</strong>: {example}</li>'
+SYNONYM = '<li><strong>{synonym}</strong>:</li>'
+LIST_ITEM = '<li>{item}</li>'
+NOTES_FOOTER = DICTIONARY_HEADER.format(title='You Notes:') + '<div>Write here...</div>'
 
 
 def generate_html_from_json(word_data: dict, collocations=None, synonyms=None):
     """
     Generates an HTML string from a given JSON data structure containing word, phonetic transcription, part of speech,
-    meanings, and examples.
+    meanings, and examples. The markup refers to the classes in CARD_CSS.
 
     :param word_data: A dictionary containing word data, including the word, phonetic transcription, part of speech,
                       meanings, and examples.
     :return: A string containing the generated HTML.
     """
-    html_content = f""
+    parts = []
+    append = parts.append
+    word = ''
     for dict_title, dict_body in word_data.items():
-        html_content += f"""<div style="background-color: #FFCC00; padding: 10px; font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; color: #1d2a57">{dict_title} Dictionary</div>"""
+        append(DICTIONARY_HEADER.format(title=f"{dict_title} Dictionary"))
         for entry in dict_body:
-            # Extract the word, phonetic, and part of speech from word_data
-            word = entry['word']
-            phonetic = entry['phonetic']
-            part_of_speech = entry['part_of_speech']
-
-            html_content += "<hr style='border: 1px solid gray; opacity: 0.5' />"  # Add the Gray line
             # Start with the word, phonetic, and part of speech
-            html_content += f"""
-            <div style="font-size: 24px; font-weight: bold;">{word}</div>
-            <div style="font-style: italic; color: #555;">
-                <span>{part_of_speech}</span> <br />
-                <span style="color: #3949ab;">UK {phonetic}</span>
-            </div>
-            """
+            word = entry['word']
+            append(ENTRY_HEADER.format(word=word, part_of_speech=entry['part_of_speech'], phonetic=entry['phonetic']))
 
             # Add meanings and examples
             for context in entry['contexts']:
-                title = context['title']
-                title_tag = f'<span style="font-weight: bold; color: #5d2fc1;">{title}</span>'
-
-                if title is not None:
-                    html_content += "<hr style='border: 2px solid #5d2fc1;' />"  # Add the Purple line
-                    html_content += title_tag
-                html_content += f"<div style='margin-bottom: 20px;'>"
+                if context['title'] is not None:
+                    append(CONTEXT_TITLE.format(title=context['title']))
+                append('<div class="cx">')
                 for meaning in context["meanings"]:
-                    level = meaning['level']
-                    level_tag = f"<span style='background-color:#3949ab;color:white;padding:3px;border-radius:5px;'>{level}</span>" if level else "<span style='background-color:#3949ab;color:white;padding:3px;border-radius:5px;'>None</span>"
-
-                    extra_info = meaning['extra_info']
-                    extra_info_tag = f'<span style="color: #4C6D91;">{extra_info}</span>'
-
-                    html_content += "<hr style='border: 1px solid #fec400;' />"  # Add the yellow line
-                    html_content += f"<div style='text-align: left;'>{level_tag} {extra_info_tag}</div>"
-                    html_content += f"<div style='text-align: left; font-weight: bold; margin-top: 5px;'>{meaning['meaning']}</div>"
+                    append(MEANING.format(level=meaning['level'], extra_info=meaning['extra_info'],
+                                          meaning=meaning['meaning']))
                     for example in meaning['examples']:
-                        html_content += f"<div style='text-align: left; margin-left: 20px; font-style: italic; margin-top: 5px;'>• {example}</div>"
-
-                html_content += "</div>"
+                        append(EXAMPLE.format(example=example))
+                append('</div>')
 
     # Optionally add collocations with examples
     if collocations:
-        # html_content += "<h3>Collocations:</h3>"
-        html_content += f"""<div style="background-color: #FFCC00; padding: 10px; font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; color: #1d2a57">{word} | Collocations</div>"""
-        html_content += "<ul>"
+        append(DICTIONARY_HEADER.format(title=f"{word} | Collocations"))
+        append('<ul>')
         for collocation_item in collocations:
-            collocation = collocation_item.get('collocation', '')
-            example = collocation_item.get('example', '')
-            html_content += f"<li><strong>{collocation}</strong>: {example}</li>"
-        html_content += "</ul>"
-        html_content += "<hr style='border: 1px solid #fec400;' />"  # Add the yellow line
+            append(COLLOCATION.format(collocation=collocation_item.get('collocation', ''),
+                                      example=collocation_item.get('example', '')))
+        append('</ul><hr class="mh"/>')
 
     if synonyms:
-        # html_content += "<h3>Synonyms:</h3>"
-        html_content += f"""<div style="background-color: #FFCC00; padding: 10px; font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; color: #1d2a57">{word} | Synonyms</div>"""
-        html_content += "<ul>"
+        append(DICTIONARY_HEADER.format(title=f"{word} | Synonyms"))
+        append('<ul>')
         for synonym_item in synonyms:
-            synonym = synonym_item.get('synonym', '')
-            examples = synonym_item.get('examples', '')
-            html_content += f"<li><strong>{synonym}</strong>:</li>"
-            html_content += "<ul>"
-            for example in examples:
-                html_content += f"<li>{example}</li>"
-            html_content += "</ul>"
-        html_content += "</ul>"
+            append(SYNONYM.format(synonym=synonym_item.get('synonym', '')))
+            append('<ul>')
+            for example in synonym_item.get('examples', ''):
+                append(LIST_ITEM.format(item=example))
+            append('</ul>')
+        append('</ul>')
 
-    html_content += f"""<div style="background-color: #FFCC00; padding: 10px; font-family: Arial, sans-serif; font-size: 14px; font-weight: bold; color: #1d2a57">You Notes:</div>"""
-    html_content += "<div>Write here...</div>"
-    return html_content
+    append(NOTES_FOOTER)
+    return ''.join(parts)
 
 
 # Example usage
@@ -335,8 +337,8 @@ if __name__ == "__main__":
     # Call the function to generate the HTML
     html_result = generate_html_from_json(word_meanings, collocations, synonyms)
 
-    # Output or save the HTML content
+    # Output or save the HTML content, with the card styles so the page looks like the card
     with open("../../word_meanings.html", "w") as file:
-        file.write(html_result)
+        file.write(f"<style>{CARD_CSS}</style>{html_result}")
 
     print("HTML file created successfully.")
@@ -0,0 +1,155 @@
+import contextlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+from config.settings import METRICS_LOG_PATH, METRICS_MAX_SAMPLES
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Metrics:
+    """
+    Collects stage durations and counters of a run.
+
+    Stages are timed with `timer(stage, word)` and counters bumped with `incr(name)`. When a log path is set, every
+    timing and event is also appended as a JSON line, and `report()` appends the summary.
+
+    Counts, totals and maxima are exact. The percentiles come from a uniform sample of at most `max_samples`
+    durations per stage, so memory does not grow with the length of the run.
+    """
+
+    def __init__(self, log_path=METRICS_LOG_PATH, max_samples=METRICS_MAX_SAMPLES):
+        self.log_path = log_path
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._log_file = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.durations = {}
+            self.stage_totals = {}  # stage -> [count, total seconds, max seconds]
+            self.counters = Counter()
+
+    def _log(self, record):
+        if self.log_path is None:
+            return
+        line = json.dumps({'time': round(time.time(), 3), **record}, ensure_ascii=False)
+        with self._lock:
+            if self._log_file is None:
+                self._log_file = open(self.log_path, mode='a', encoding='utf-8')
+            self._log_file.write(line + '\n')
+            self._log_file.flush()
+
+    @contextlib.contextmanager
+    def timer(self, stage, word=None):
+        """
+        Time the enclosed block as one occurrence of `stage`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                totals = self.stage_totals.setdefault(stage, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += duration
+                totals[2] = max(totals[2], duration)
+                samples = self.durations.setdefault(stage, [])
+                if len(samples) < self.max_samples:
+                    samples.append(duration)
+                else:
+                    # Reservoir sampling keeps every duration equally likely to be in the sample
+                    slot = random.randrange(totals[0])
+                    if slot < self.max_samples:
+                        samples[slot] = duration
+            self._log({'event': 'stage', 'stage': stage, 'word': word, 'seconds': round(duration, 6)})
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def event(self, name, **fields):
+        """
+        Count an event and log it with its fields, e.g. a failed word and its error.
+        """
+        self.incr(name)
+        self._log({'event': name, **fields})
+
+    def export(self):
+        """
+        Return the collected stages and counters in a form that can be sent from a worker process to merge().
+        """
+        with self._lock:
+            return {'stage_totals': {stage: list(values) for stage, values in self.stage_totals.items()},
+                    'durations': {stage: list(values) for stage, values in self.durations.items()},
+                    'counters': dict(self.counters)}
+
+    def merge(self, exported):
+        """
+        Add the stages and counters a worker process collected, see export().
+        """
+        with self._lock:
+            for stage, (count, total, longest) in exported['stage_totals'].items():
+                totals = self.stage_totals.setdefault(stage, [0, 0.0, 0.0])
+                totals[0] += count
+                totals[1] += total
+                totals[2] = max(totals[2], longest)
+            for stage, values in exported['durations'].items():
+                samples = self.durations.setdefault(stage, [])
+                samples.extend(values)
+                if len(samples) > self.max_samples:
+                    samples[:] = random.sample(samples, self.max_samples)
+            self.counters.update(exported['counters'])
+
+    def summary(self):
+        with self._lock:
+            durations = {stage: list(values) for stage, values in self.durations.items()}
+            totals = {stage: list(values) for stage, values in self.stage_totals.items()}
+            counters = dict(self.counters)
+        stages = {
+            stage: {
+                'count': totals[stage][0],
+                'total_seconds': round(totals[stage][1], 3),
+                'p50_ms': round(percentile(values, 0.5) * 1000, 2),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+                'max_ms': round(totals[stage][2] * 1000, 2),
+            }
+            for stage, values in durations.items()
+        }
+        return {'stages': stages, 'counters': counters}
+
+    def report(self, **extra):
+        """
+        Print the summary of the run and append it to the log.
+
+        :param extra: Additional sections for the summary, e.g. the state of the rate controllers.
+        """
+        summary = {**self.summary(), **extra}
+        self._log({'event': 'summary', **summary})
+        print(f"{'stage':<24}{'count':>8}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for stage, values in sorted(summary['stages'].items()):
+            print(f"{stage:<24}{values['count']:>8}{values['total_seconds']:>10.2f}{values['p50_ms']:>10.2f}"
+                  f"{values['p95_ms']:>10.2f}{values['max_ms']:>10.2f}")
+        for name, value in sorted(summary['counters'].items()):
+            print(f"{name}: {value}")
+        for name, section in extra.items():
+            print(f"{name}: {section}")
+        return summary
+
+    def close(self):
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+
+# Process-wide metrics shared by the scrappers, the dataset pipeline and the deck builder
+metrics = Metrics()
@@ -0,0 +1,81 @@
+import asyncio
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from config.settings import (ASYNC_MAX_CONNECTIONS, HTTP_BACKOFF_FACTOR, HTTP_CACHE_ENABLED, HTTP_RETRIES,
+                             HTTP_RETRY_STATUSES, HTTP_TIMEOUT)
+from src.scrappers.http_cache import get_cache
+from src.instrumentation.metrics import metrics
+from src.scrappers.http_client import DEFAULT_HEADERS, record_response
+from src.scrappers.rate_limit import get_bucket, report_response
+
+
+def create_async_client(max_connections=ASYNC_MAX_CONNECTIONS):
+    """
+    Create an httpx client that multiplexes all requests over at most `max_connections` keep-alive sockets.
+    """
+    return httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=HTTP_TIMEOUT, follow_redirects=True,
+                             limits=httpx.Limits(max_connections=max_connections,
+                                                 max_keepalive_connections=max_connections))
+
+
+def _to_response(response):
+    """
+    Convert an httpx response to a requests.Response, so the scrappers and the cache handle both alike.
+    """
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.url = str(response.url)
+    converted._content = response.content
+    converted.encoding = response.encoding
+    converted.headers = CaseInsensitiveDict(response.headers)
+    converted.reason = response.reason_phrase
+    return converted
+
+
+async def fetch_async(client, url, headers=None, cache=HTTP_CACHE_ENABLED):
+    """
+    The async counterpart of http_client.fetch: the same cache, per-host rate controllers and retry policy, but every
+    wait is an asyncio.sleep, so retries and rate limits never block the event loop.
+
+    :return: A requests.Response.
+    """
+    cached_page = get_cache().get(url) if cache else None
+    if cached_page is not None:
+        if get_cache().is_fresh(cached_page):
+            metrics.incr('http_cache.hits')
+            return cached_page.to_response()
+        headers = {**cached_page.validators(), **(headers or {})}
+    if cache:
+        metrics.incr('http_cache.misses')
+
+    bucket = get_bucket(urlsplit(url).hostname)
+    for attempt in range(HTTP_RETRIES + 1):
+        await asyncio.sleep(bucket.reserve())
+        try:
+            with metrics.timer('http.request'):
+                response = await client.get(url, headers=headers)
+        except httpx.TransportError:
+            if attempt == HTTP_RETRIES:
+                raise
+            metrics.incr('http.retries')
+            await asyncio.sleep(HTTP_BACKOFF_FACTOR * 2 ** attempt)
+            continue
+        record_response(response)
+        throttled = report_response(url, response.status_code, response.headers.get('Retry-After'),
+                                    HTTP_RETRY_STATUSES)
+        if not throttled or attempt == HTTP_RETRIES:
+            break
+        metrics.incr('http.retries')
+    response = _to_response(response)
+
+    if cached_page is not None and response.status_code == 304:
+        metrics.incr('http_cache.revalidated')
+        get_cache().touch(url)
+        return cached_page.to_response()
+    if cache and response.status_code == 200:
+        get_cache().put(url, response)
+    return response
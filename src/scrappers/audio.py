@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from config.settings import AUDIO_QUEUE_PER_WORKER, AUDIO_WORKERS
+from src.instrumentation.metrics import metrics
+from src.scrappers.http_client import fetch
+from src.scrappers.media_store import get_media_store
+
+
+def download_file(url, path, chunk_size=64 * 1024, hasher=None):
+    """
+    Stream a file to disk. The data is written to a temporary file that only replaces `path` once the whole body
+    arrived, so an interrupted download never leaves a truncated file behind.
+
+    :param hasher: An optional hashlib object that is fed the body as it streams in.
+    :return: The number of bytes written.
+    """
+    response = fetch(url, cache=False, stream=True)
+    with response:
+        response.raise_for_status()
+        temp_path = f"{path}.part"
+        size = 0
+        with open(temp_path, 'wb') as out_file:
+            for chunk in response.iter_content(chunk_size):
+                out_file.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                size += len(chunk)
+    expected_size = response.headers.get('Content-Length')
+    if expected_size is not None and response.headers.get('Content-Encoding') is None and int(expected_size) != size:
+        os.remove(temp_path)
+        raise requests.exceptions.ContentDecodingError(f"Expected {expected_size} bytes from {url}, got {size}.")
+    os.replace(temp_path, path)
+    return size
+
+
+class AudioDownloader:
+    """
+    Downloads pronunciations in the background on a bounded pool of threads into the content-addressed media store.
+    Every URL and every headword is handled at most once, and audio the store already has is not fetched again.
+    Only the downloads in flight are tracked, and at most `queue_size` of them, so the bookkeeping stays the same
+    size however long the word list is.
+
+    Usage:
+        with AudioDownloader() as audio:
+            audio.submit_entries(word_data)
+    """
+
+    def __init__(self, workers=AUDIO_WORKERS, store=None, queue_size=None):
+        self.store = store or get_media_store()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(queue_size or workers * AUDIO_QUEUE_PER_WORKER)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._words = set()  # words whose audio is being downloaded
+        self._waiting = {}  # URL being downloaded -> further words sharing it
+        self._pending = set()
+        self._error = None  # first unexpected error of a download, raised by wait()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def submit(self, word, audio_url):
+        """
+        Queue the download of `audio_url` as the audio of `word` unless it is already queued or in the store.
+        Blocks while the queue is full.
+        """
+        with self._lock:
+            if word in self._words:
+                return
+            if audio_url in self._waiting:
+                self._words.add(word)
+                self._waiting[audio_url].append(word)
+                return
+            if self.store.lookup(word) is not None:
+                self.skipped += 1
+                metrics.incr('audio.skipped')
+                return
+            digest = self.store.lookup_url(audio_url)
+            if digest is not None:
+                self.store.link(word, digest, audio_url)
+                self.skipped += 1
+                metrics.incr('audio.skipped')
+                return
+            self._words.add(word)
+            self._waiting[audio_url] = []
+        self._slots.acquire()
+        future = self._executor.submit(self._download, word, audio_url)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._finished)
+
+    def submit_entries(self, word_data):
+        """
+        Queue the pronunciation of every headword in the output of get_word_meanings.
+        The first entry with audio wins when several entries share a headword.
+        """
+        for dict_body in word_data.values():
+            for entry in dict_body:
+                if entry.get('audio_url'):
+                    self.submit(entry['word'], entry['audio_url'])
+
+    def _download(self, word, audio_url):
+        sharing_words = []
+        try:
+            os.makedirs(self.store.media_dir, exist_ok=True)
+            hasher = hashlib.sha1()
+            path = os.path.join(self.store.media_dir, f"{uuid.uuid4().hex}.download")
+            with metrics.timer('audio.download', word):
+                size = download_file(audio_url, path, hasher=hasher)
+            digest = self.store.add(word, path, hasher.hexdigest(), audio_url)
+            metrics.incr('audio.downloaded')
+            metrics.incr('audio.bytes', size)
+            with self._lock:
+                self.downloaded += 1
+                sharing_words = self._waiting.pop(audio_url)
+            for sharing_word in sharing_words:
+                self.store.link(sharing_word, digest, audio_url)
+            print(f"Audio for '{word}' has been downloaded as '{self.store.filename(digest)}'.")
+        except (requests.exceptions.RequestException, OSError) as e:
+            with self._lock:
+                self.failed += 1
+            metrics.event('audio.failed', word=word, url=audio_url, error=repr(e))
+            print(f"Failed to download the audio for '{word}': {e}")
+        finally:
+            with self._lock:
+                sharing_words += self._waiting.pop(audio_url, [])
+                self._words.difference_update([word, *sharing_words])
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            if self._error is None:
+                self._error = future.exception()
+            if not self._pending:
+                self._idle.notify_all()
+        self._slots.release()
+
+    def wait(self):
+        """
+        Block until every queued download finished.
+        """
+        with self._lock:
+            self._idle.wait_for(lambda: not self._pending)
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,40 +1,71 @@
 from urllib.parse import quote
 
-import requests
-from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3 import Retry
+from src.instrumentation.metrics import metrics
+from src.scrappers.entry_cache import cached_entry, cached_entry_async
+from src.scrappers.http_client import fetch
+from src.scrappers.parsing import free_soup, make_soup, COLLOCATIONS_STRAINER
 
+BASE_URL = "https://dictionary.cambridge.org/collocation/english/"
 
+
+@cached_entry('collocations')
 def get_collocations(word):
-    base_url = "https://dictionary.cambridge.org/collocation/english/"
-    url = base_url + quote(word)
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-
-    # Retry strategy
-    retry_strategy = Retry(
-        total=3,
-        status_forcelist=[429, 500, 502, 503, 504],
-        backoff_factor=1
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    http = requests.Session()
-    http.mount("https://", adapter)
-    http.mount("http://", adapter)
+    markup = fetch_collocations_page(word)
+    if markup is None:
+        return []
+
+    with metrics.timer('parse.collocations', word):
+        return parse_collocations(markup)
+
+
+def fetch_collocations_page(word):
+    """
+    Download the Cambridge collocation page of a word, or return None if there is none.
+    """
+    url = BASE_URL + quote(word)
 
     # Send a request to the website
-    response = http.get(url, headers=headers)
+    response = fetch(url)
 
-    if response.status_code != 200:
+    if response.status_code == 404:
+        print(f"Failed to retrieve data for the word '{word}'.")
+        return None
+    # Throttling and server errors do not mean the word has no collocations
+    response.raise_for_status()
+    return response.text
+
+
+@cached_entry_async('collocations')
+async def get_collocations_async(word, client):
+    """
+    The async counterpart of get_collocations, using a client from create_async_client.
+    """
+    from src.scrappers.async_client import fetch_async
+
+    response = await fetch_async(client, BASE_URL + quote(word))
+
+    if response.status_code == 404:
         print(f"Failed to retrieve data for the word '{word}'.")
         return []
+    response.raise_for_status()
 
+    with metrics.timer('parse.collocations', word):
+        return parse_collocations(response.text)
+
+
+def parse_collocations(markup):
+    """
+    Extract the collocations and their examples from a Cambridge collocation page.
+    """
     # Parse the HTML content using BeautifulSoup
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = make_soup(markup, COLLOCATIONS_STRAINER)
+    try:
+        return extract_collocations(soup)
+    finally:
+        free_soup(soup)
+
 
+def extract_collocations(soup):
     collocations = []
 
     # Find all the div elements with class 'eg' containing collocations
@@ -0,0 +1,284 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+from config.settings import ENTRY_CACHE_ENABLED, ENTRY_CACHE_PATH, NEGATIVE_CACHE_TTL
+from src.instrumentation.metrics import metrics
+
+
+class EntryNotFound(Exception):
+    """
+    A source has no entry for a word. Unlike throttling or server errors this is remembered in the negative cache.
+    """
+
+
+class EntryCache:
+    """
+    A SQLite cache of the data extracted by the scrappers, keyed by source and word.
+    Every record carries the version of the extraction code that produced it and is ignored once that code changes.
+
+    A second table remembers the words a source had nothing for, either an empty result or an EntryNotFound/404
+    error, so known misses are not requested again until `negative_ttl` seconds passed.
+
+    Records and misses stored before `refresh_after` (a timestamp, 0 by default) are ignored, so a refreshing build
+    scrapes every word again while reusing what it stored itself.
+    """
+
+    def __init__(self, path=ENTRY_CACHE_PATH, negative_ttl=NEGATIVE_CACHE_TTL):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self.refresh_after = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    source TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (source, word)
+                )
+            """)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS misses (
+                    source TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    error TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (source, word)
+                )
+            """)
+            self._connection.commit()
+        return self._connection
+
+    def get(self, source, word, version):
+        """
+        Return the cached data of a word, or None if it is missing or was extracted by another code version.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT data FROM entries WHERE source = ? AND word = ? AND version = ? AND created_at >= ?",
+                (source, word, version, self.refresh_after)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, source, word, version, data):
+        blob = zlib.compress(json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            connection = self._connect()
+            connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                               (source, word, version, blob, time.time()))
+            connection.commit()
+
+    def get_miss(self, source, word):
+        """
+        Return the (error, result) remembered for a word the source had nothing for, or None if no miss is known or
+        it expired.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT error, result FROM misses WHERE source = ? AND word = ? AND created_at > ?",
+                (source, word, max(time.time() - self.negative_ttl, self.refresh_after))).fetchone()
+        if row is None:
+            return None
+        error, result = row
+        return error, json.loads(result) if result is not None else None
+
+    def put_miss(self, source, word, error=None, result=None):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("INSERT OR REPLACE INTO misses VALUES (?, ?, ?, ?, ?)",
+                               (source, word, error, json.dumps(result) if error is None else None, time.time()))
+            connection.commit()
+
+    def stats(self):
+        """
+        Return the number of cached records per source, and of known misses per source under 'misses'.
+        """
+        with self._lock:
+            connection = self._connect()
+            rows = connection.execute("SELECT source, COUNT(*) FROM entries GROUP BY source").fetchall()
+            misses = connection.execute("SELECT source, COUNT(*) FROM misses WHERE created_at > ? GROUP BY source",
+                                        (time.time() - self.negative_ttl,)).fetchall()
+        return {**dict(rows), 'misses': dict(misses)}
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM entries")
+            connection.execute("DELETE FROM misses")
+            connection.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_entry_cache():
+    """
+    Return the process-wide entry cache, creating it on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EntryCache()
+    return _cache
+
+
+def set_entry_cache(cache):
+    """
+    Replace the process-wide entry cache. Passing None makes the next get_entry_cache() call create a new one.
+    """
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+@functools.lru_cache(maxsize=None)
+def _source_hash(module_name):
+    from src.scrappers import parsing
+
+    hasher = hashlib.sha1()
+    for module in (sys.modules[module_name], parsing):
+        with open(module.__file__, 'rb') as source_file:
+            hasher.update(source_file.read())
+    return hasher.hexdigest()[:12]
+
+
+def code_version(module_name):
+    """
+    Return the version of the data a module extracts: a hash of its source and of src/scrappers/parsing.py, which
+    holds the strainers, along with the parser backend in use.
+    """
+    # parsing imports bs4, which the cache itself does not need
+    from src.scrappers import parsing
+
+    return f"{_source_hash(module_name)}-{parsing.HTML_PARSER}-{int(parsing.PARSE_ONLY_SUBTREES)}"
+
+
+def load_entry(source, module_name, word):
+    """
+    Return the cached data of a word extracted by the current code of `module_name`, or None.
+    """
+    if not ENTRY_CACHE_ENABLED:
+        return None
+    data = get_entry_cache().get(source, word, code_version(module_name))
+    metrics.incr(f"entry_cache.{source}.{'misses' if data is None else 'hits'}")
+    return data
+
+
+def store_entry(source, module_name, word, data):
+    """
+    Cache the data of a word unless it is empty.
+    """
+    if ENTRY_CACHE_ENABLED and data:
+        get_entry_cache().put(source, word, code_version(module_name), data)
+
+
+def is_miss(error):
+    """
+    Whether an error means the source has no entry for the word, rather than that the request failed.
+    """
+    import requests
+
+    if isinstance(error, EntryNotFound):
+        return True
+    return (isinstance(error, requests.HTTPError) and error.response is not None
+            and error.response.status_code in (404, 410))
+
+
+def recall_miss(source, word):
+    """
+    Return the empty result remembered for a word, raise EntryNotFound if the source is known to have no entry for
+    it, or return None if no miss is known.
+    """
+    if not ENTRY_CACHE_ENABLED:
+        return None
+    miss = get_entry_cache().get_miss(source, word)
+    if miss is None:
+        return None
+    metrics.incr(f"entry_cache.{source}.negative_hits")
+    error, result = miss
+    if error is not None:
+        raise EntryNotFound(f"{error} (known miss)")
+    return result
+
+
+def store_result(source, module_name, word, data):
+    """
+    Cache the data of a word, or remember the miss if it is empty.
+    """
+    if data:
+        store_entry(source, module_name, word, data)
+    elif ENTRY_CACHE_ENABLED:
+        get_entry_cache().put_miss(source, word, result=data)
+
+
+def store_error(source, word, error):
+    """
+    Remember the miss if an error means the source has no entry for the word.
+    """
+    if ENTRY_CACHE_ENABLED and is_miss(error):
+        get_entry_cache().put_miss(source, word, error=str(error))
+
+
+def cached_entry(source):
+    """
+    Decorate a scrapper `func(word)` so its non-empty results are stored in the entry cache and reused until the
+    scrapper's module changes. Empty results and missing entries are remembered in the negative cache and answered
+    from it without a request.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(word):
+            data = recall_miss(source, word)
+            if data is None:
+                data = load_entry(source, func.__module__, word)
+            if data is None:
+                try:
+                    data = func(word)
+                except Exception as e:
+                    store_error(source, word, e)
+                    raise
+                store_result(source, func.__module__, word, data)
+            return data
+        return wrapper
+    return decorator
+
+
+def cached_entry_async(source):
+    """
+    The same as cached_entry for a coroutine scrapper `func(word, client)`. Both share their records, so the sync
+    and async scrapper of a source reuse each other's results.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(word, client):
+            data = recall_miss(source, word)
+            if data is None:
+                data = load_entry(source, func.__module__, word)
+            if data is None:
+                try:
+                    data = await func(word, client)
+                except Exception as e:
+                    store_error(source, word, e)
+                    raise
+                store_result(source, func.__module__, word, data)
+            return data
+        return wrapper
+    return decorator
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from config.settings import HTTP_CACHE_PATH, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES
+
+
+class CachedPage:
+    def __init__(self, url, body, encoding, content_type, etag, last_modified, fetched_at):
+        self.url = url
+        self.body = body
+        self.encoding = encoding
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
+    def validators(self):
+        """
+        Return the conditional request headers for revalidating this page.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        """
+        Build a requests.Response so callers can use the cached page like a fresh one.
+        """
+        # Imported here, so opening the cache, e.g. for `cli.py cache stats`, does not load requests
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response._content = self.body
+        response.encoding = self.encoding
+        response.headers = CaseInsensitiveDict()
+        if self.content_type:
+            response.headers['Content-Type'] = self.content_type
+        response.from_cache = True
+        return response
+
+
+class ResponseCache:
+    """
+    A SQLite cache of successful GET responses keyed by the hash of their URL.
+    Bodies are stored zlib-compressed; the total size is capped by evicting the least recently used pages.
+
+    Pages fetched before `refresh_after` (a timestamp, 0 by default) are revalidated however fresh they are, which
+    is how a refreshing build gets current pages.
+    """
+
+    def __init__(self, path=HTTP_CACHE_PATH, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.refresh_after = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    encoding TEXT,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def get(self, url):
+        """
+        Return the CachedPage for a URL, or None if it was never stored.
+        """
+        key = self._key(url)
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT body, encoding, content_type, etag, last_modified, fetched_at FROM pages WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            connection.commit()
+        body, encoding, content_type, etag, last_modified, fetched_at = row
+        return CachedPage(url, zlib.decompress(body), encoding, content_type, etag, last_modified, fetched_at)
+
+    def is_fresh(self, page):
+        """
+        Whether a cached page can be used without a request.
+        """
+        return page.is_fresh(self.ttl) and page.fetched_at >= self.refresh_after
+
+    def put(self, url, response):
+        """
+        Store a successful response and evict old pages if the cache grew above its size cap.
+        """
+        body = zlib.compress(response.content)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(url), url, body, len(body), response.encoding, response.headers.get('Content-Type'),
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now))
+            connection.commit()
+            self._evict(connection)
+
+    def touch(self, url):
+        """
+        Mark a page as revalidated, e.g. after a 304 Not Modified response.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                               (now, now, self._key(url)))
+            connection.commit()
+
+    def _evict(self, connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the cap so we do not evict on every insert
+        target = self.max_bytes * 0.9
+        for key, size in connection.execute("SELECT key, size FROM pages ORDER BY accessed_at").fetchall():
+            if total <= target:
+                break
+            connection.execute("DELETE FROM pages WHERE key = ?", (key,))
+            total -= size
+        connection.commit()
+
+    def stats(self):
+        """
+        Return the number of cached pages and their total compressed size in bytes.
+        """
+        with self._lock:
+            count, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {'pages': count, 'bytes': size}
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM pages")
+            connection.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the process-wide response cache, creating it on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def set_cache(cache):
+    """
+    Replace the process-wide response cache. Passing None makes the next get_cache() call create a new one.
+    """
+    global _cache
+    with _cache_lock:
+        _cache = cache
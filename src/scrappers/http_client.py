@@ -0,0 +1,124 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config.settings import (HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_RETRIES, HTTP_BACKOFF_FACTOR,
+                             HTTP_RETRY_STATUSES, HTTP_TIMEOUT, HTTP_CACHE_ENABLED)
+from src.instrumentation.metrics import metrics
+from src.scrappers.http_cache import get_cache
+from src.scrappers.rate_limit import report_response, wait_for_turn
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, retries=HTTP_RETRIES,
+                   backoff_factor=HTTP_BACKOFF_FACTOR):
+    """
+    Create a requests session with keep-alive connection pools. The session itself only retries connection errors;
+    throttling and server errors are retried by fetch(), so the host's rate controller sees them.
+
+    :param pool_connections: Number of per-host connection pools to cache.
+    :param pool_maxsize: Maximum number of connections kept alive in each pool.
+    :param retries: Total number of retries for failed connections.
+    :param backoff_factor: Backoff factor between connection retries.
+    :return: A configured requests.Session.
+    """
+    retry_strategy = Retry(
+        total=retries,
+        backoff_factor=backoff_factor
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry_strategy)
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide session, creating it on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def set_session(session):
+    """
+    Replace the process-wide session, e.g. with one using a custom transport adapter.
+    Passing None drops the current session so the next call to get_session() creates a new one.
+    """
+    global _session
+    with _session_lock:
+        old_session = _session
+        _session = session
+    if old_session is not None and old_session is not session:
+        old_session.close()
+
+
+def record_response(response, streamed=False):
+    """
+    Count a response received from the network and its size.
+    """
+    metrics.incr(f"http.status.{response.status_code}")
+    if streamed:
+        metrics.incr('http.bytes', int(response.headers.get('Content-Length') or 0))
+    else:
+        metrics.incr('http.bytes', len(response.content))
+
+
+def fetch(url, headers=None, cache=HTTP_CACHE_ENABLED, **kwargs):
+    """
+    Send a GET request through the shared session so connections are reused across calls.
+    Successful responses are kept in the on-disk cache; a fresh cached page is returned without any request, and a
+    stale one is revalidated with its ETag/Last-Modified validators.
+    The request waits for the politeness budget of the target host first, and every response is reported back to
+    the host's rate controller. Responses with one of HTTP_RETRY_STATUSES are retried up to HTTP_RETRIES times,
+    paced by the controller which slows down and honours Retry-After.
+
+    :param url: The URL to fetch.
+    :param headers: Optional headers that override the session defaults.
+    :param cache: Whether to read from and write to the response cache. Streamed requests are never cached.
+    :return: A requests.Response.
+    """
+    kwargs.setdefault('timeout', HTTP_TIMEOUT)
+    cache = cache and not kwargs.get('stream')
+    cached_page = get_cache().get(url) if cache else None
+    if cached_page is not None:
+        if get_cache().is_fresh(cached_page):
+            metrics.incr('http_cache.hits')
+            return cached_page.to_response()
+        headers = {**cached_page.validators(), **(headers or {})}
+    if cache:
+        metrics.incr('http_cache.misses')
+
+    for attempt in range(HTTP_RETRIES + 1):
+        wait_for_turn(url)
+        with metrics.timer('http.request'):
+            response = get_session().get(url, headers=headers, **kwargs)
+        record_response(response, kwargs.get('stream', False))
+        throttled = report_response(url, response.status_code, response.headers.get('Retry-After'),
+                                    HTTP_RETRY_STATUSES)
+        if not throttled or attempt == HTTP_RETRIES:
+            break
+        metrics.incr('http.retries')
+        response.close()
+
+    if cached_page is not None and response.status_code == 304:
+        metrics.incr('http_cache.revalidated')
+        get_cache().touch(url)
+        return cached_page.to_response()
+    if cache and response.status_code == 200:
+        get_cache().put(url, response)
+    return response
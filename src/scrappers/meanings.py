@@ -1,42 +1,66 @@
-import os.path
-
-import requests
-from requests.adapters import HTTPAdapter
-from requests.exceptions import ConnectionError, HTTPError
-from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
 from urllib.parse import quote, urljoin
 
-from config.settings import AUDIO_DIR
+from src.instrumentation.metrics import metrics
+from src.scrappers.entry_cache import cached_entry, cached_entry_async
+from src.scrappers.http_client import fetch
+from src.scrappers.parsing import free_soup, make_soup, MEANINGS_STRAINER
+
+BASE_URL = "https://dictionary.cambridge.org/dictionary/english/"
 
 
+@cached_entry('meanings')
 def get_word_meanings(word):
-    # Base URL and headers
-    base_url = "https://dictionary.cambridge.org/dictionary/english/"
-    url = base_url + quote(word)
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-
-    # Retry strategy
-    retry_strategy = Retry(
-        total=3,
-        status_forcelist=[429, 500, 502, 503, 504],
-        backoff_factor=1
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    http = requests.Session()
-    http.mount("https://", adapter)
-    http.mount("http://", adapter)
+    markup = fetch_meanings_page(word)
+    with metrics.timer('parse.meanings', word):
+        return parse_word_meanings(markup)
+
+
+def fetch_meanings_page(word):
+    """
+    Download the Cambridge dictionary page of a word.
+    """
+    url = BASE_URL + quote(word)
 
     # Send a GET request to the URL
-    response = http.get(url, headers=headers)
+    response = fetch(url)
     response.raise_for_status()
+    return response.text
 
-    # Parse the HTML content using BeautifulSoup
-    soup = BeautifulSoup(response.text, 'html.parser')
 
+@cached_entry_async('meanings')
+async def get_word_meanings_async(word, client):
+    """
+    The async counterpart of get_word_meanings, using a client from create_async_client.
+    """
+    from src.scrappers.async_client import fetch_async
+
+    response = await fetch_async(client, BASE_URL + quote(word))
+    response.raise_for_status()
+
+    with metrics.timer('parse.meanings', word):
+        return parse_word_meanings(response.text)
+
+
+def parse_word_meanings(markup):
+    """
+    Extract the entries of a Cambridge dictionary page.
+
+    :param markup: The HTML of the page.
+    :return: A dictionary mapping dictionary titles to lists of entries.
+    """
+    # Parse the HTML content using BeautifulSoup
+    soup = make_soup(markup, MEANINGS_STRAINER)
+    try:
+        return extract_word_meanings(soup)
+    finally:
+        free_soup(soup)
+
+
+def extract_word_meanings(soup):
+    """
+    Extract the entries from a parsed Cambridge dictionary page. Only plain strings end up in the result, so the
+    tree can be freed afterwards.
+    """
     # Dictionary to store all word data
     word_data = {}
 
@@ -71,7 +95,7 @@ def get_word_meanings(word):
                 phonetic = entry_body.find('span', class_='ipa').text.strip() if entry_body.find('span',
                                                                                                  class_='ipa') else None
 
-                # Download the Audio
+                # Find the Audio
                 audio_tag = entry_body.find('source', attrs={'type': 'audio/mpeg'})
                 audio_url = None
                 if not audio_tag:
@@ -82,21 +106,7 @@ def get_word_meanings(word):
 
                     # Ensure the URL is complete
                     if not audio_url.startswith('http'):
-                        audio_url = urljoin(base_url, audio_url)
-
-                    # Fetch the audio file
-                    try:
-                        audio_response = http.get(audio_url, headers=headers)
-                        audio_response.raise_for_status()
-                        # Save the audio file
-                        audio_filename = os.path.join(AUDIO_DIR, f"{word}.mp3")
-                        with open(audio_filename, 'wb') as audio_file:
-                            audio_file.write(audio_response.content)
-
-                        print(f"Audio for '{word}' has been downloaded as '{audio_filename}'.")
-
-                    except requests.exceptions.RequestException as e:
-                        print(f"Failed to download the audio for '{word}': {e}")
+                        audio_url = urljoin(BASE_URL, audio_url)
 
                 # Find all senses (contexts) in this section
                 senses = entry_body.find_all('div', class_=['pr', 'dsense', 'dsense-noh'])
@@ -155,8 +165,9 @@ def get_word_meanings(word):
                     word_data[dictionary_title] = []
                 # Add the entry to the corresponding dictionary
                 word_data[dictionary_title].append(word_entry)
-            except Exception:
-                print(Exception)
+            except Exception as e:
+                metrics.incr('parse.meanings.skipped_entries')
+                print(f"Skipped an entry that could not be parsed: {e!r}")
                 continue
     return word_data
 
@@ -0,0 +1,181 @@
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+from config.settings import AUDIO_DIR, MEDIA_INDEX_PATH
+from src.dataset.preprocess import normalize_word
+from src.instrumentation.metrics import metrics
+
+DIGEST_NAME = re.compile(r'[0-9a-f]{40}\.mp3')
+
+# PRAGMA user_version of an index whose legacy files were adopted
+LEGACY_ADOPTED = 1
+
+
+def file_digest(path, chunk_size=64 * 1024):
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as media_file:
+        for chunk in iter(lambda: media_file.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class MediaStore:
+    """
+    A content-addressed store of audio files. Every file is saved once as `{sha1}.mp3`, and a SQLite index maps each
+    headword and source URL to the hash of its file, so identical audio is stored and packaged once and looking up
+    a word's audio does not touch the file system. Words are indexed by their normalised form, so 'Monday' on the
+    card finds the audio saved for the headword 'Monday' and for 'monday' alike.
+
+    Files saved as `{word}.mp3` by earlier versions are adopted into the store in one scan when the index is first
+    opened, so lookups never touch the file system.
+    """
+
+    def __init__(self, media_dir=AUDIO_DIR, index_path=MEDIA_INDEX_PATH):
+        self.media_dir = media_dir
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            self._connection = sqlite3.connect(self.index_path, check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS media (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS words (
+                    word TEXT PRIMARY KEY,
+                    hash TEXT NOT NULL REFERENCES media (hash),
+                    url TEXT
+                );
+                CREATE INDEX IF NOT EXISTS words_url ON words (url);
+            """)
+            self._connection.commit()
+            if self._connection.execute("PRAGMA user_version").fetchone()[0] < LEGACY_ADOPTED:
+                self._adopt_legacy(self._connection)
+        return self._connection
+
+    def filename(self, digest):
+        return f"{digest}.mp3"
+
+    def path(self, digest):
+        return os.path.join(self.media_dir, self.filename(digest))
+
+    def lookup(self, word):
+        """
+        Return the hash of a word's audio, or None if the store has none.
+        """
+        with self._lock:
+            row = self._connect().execute("SELECT hash FROM words WHERE word = ?",
+                                          (normalize_word(word),)).fetchone()
+        return row[0] if row is not None else None
+
+    def lookup_url(self, url):
+        """
+        Return the hash of the audio downloaded from a URL, or None if it was never downloaded.
+        """
+        with self._lock:
+            row = self._connect().execute("SELECT hash FROM words WHERE url = ? LIMIT 1", (url,)).fetchone()
+        return row[0] if row is not None else None
+
+    def link(self, word, digest, url=None):
+        """
+        Point a word at a file already in the store.
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute("INSERT OR REPLACE INTO words VALUES (?, ?, ?)", (normalize_word(word), digest, url))
+            connection.commit()
+
+    def add(self, word, temp_path, digest=None, url=None):
+        """
+        Move a downloaded file into the store under its hash and point the word at it. If the store already holds
+        the same content, the new copy is dropped.
+
+        :return: The hash of the file.
+        """
+        digest = digest or file_digest(temp_path)
+        path = self.path(digest)
+        with self._lock:
+            connection = self._connect()
+            if os.path.isfile(path):
+                os.remove(temp_path)
+                metrics.incr('media.deduplicated')
+            else:
+                os.replace(temp_path, path)
+            connection.execute("INSERT OR IGNORE INTO media VALUES (?, ?, ?)",
+                               (digest, os.path.getsize(path), time.time()))
+            connection.execute("INSERT OR REPLACE INTO words VALUES (?, ?, ?)", (normalize_word(word), digest, url))
+            connection.commit()
+        return digest
+
+    def _adopt_legacy(self, connection):
+        """
+        Index the `{word}.mp3` files saved by earlier versions under their hashes, once per media directory.
+        """
+        adopted = 0
+        if os.path.isdir(self.media_dir):
+            for entry in os.scandir(self.media_dir):
+                if (not entry.name.endswith('.mp3') or DIGEST_NAME.fullmatch(entry.name) or not entry.is_file()
+                        or entry.stat().st_size == 0):
+                    continue
+                digest = file_digest(entry.path)
+                if not os.path.isfile(self.path(digest)):
+                    # Keep the legacy file in place; a hard link costs no space where the file system supports it
+                    try:
+                        os.link(entry.path, self.path(digest))
+                    except OSError:
+                        shutil.copyfile(entry.path, self.path(digest))
+                connection.execute("INSERT OR IGNORE INTO media VALUES (?, ?, ?)",
+                                   (digest, entry.stat().st_size, time.time()))
+                connection.execute("INSERT OR IGNORE INTO words VALUES (?, ?, NULL)",
+                                   (normalize_word(entry.name[:-len('.mp3')]), digest))
+                adopted += 1
+        connection.execute(f"PRAGMA user_version = {LEGACY_ADOPTED}")
+        connection.commit()
+        if adopted:
+            metrics.incr('media.adopted', adopted)
+            print(f"{adopted} audio files of earlier versions added to the media store.")
+
+    def stats(self):
+        """
+        Return the number of indexed words, of stored files and their total size.
+        """
+        with self._lock:
+            connection = self._connect()
+            words = connection.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+            files, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media").fetchone()
+        return {'words': words, 'files': files, 'bytes': size}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_media_store():
+    """
+    Return the process-wide media store, creating it on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MediaStore()
+    return _store
+
+
+def set_media_store(store):
+    """
+    Replace the process-wide media store. Passing None makes the next get_media_store() call create a new one.
+    """
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,38 @@
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+from config.settings import HTML_PARSER, PARSE_ONLY_SUBTREES
+
+# The subtrees each scrapper reads; everything else on the page is skipped while parsing
+MEANINGS_STRAINER = SoupStrainer('div', class_='pr dictionary')
+COLLOCATIONS_STRAINER = SoupStrainer('div', class_='eg')
+SYNONYMS_STRAINER = SoupStrainer('span', class_='body')
+
+
+def make_soup(markup, strainer=None, parser=None, parse_only_subtrees=None):
+    """
+    Parse a page with the configured backend.
+
+    :param markup: The HTML as str or bytes.
+    :param strainer: A SoupStrainer selecting the subtrees to build when PARSE_ONLY_SUBTREES is on.
+    :param parser: Overrides the HTML_PARSER setting, e.g. 'lxml'.
+    :param parse_only_subtrees: Overrides the PARSE_ONLY_SUBTREES setting.
+    :return: A BeautifulSoup object.
+    """
+    if parse_only_subtrees is None:
+        parse_only_subtrees = PARSE_ONLY_SUBTREES
+    return BeautifulSoup(markup, parser or HTML_PARSER, parse_only=strainer if parse_only_subtrees else None)
+
+
+def free_soup(soup):
+    """
+    Break up a parse tree as soon as its data is extracted. The tree is full of reference cycles, so otherwise it
+    stays in memory until the garbage collector gets to it.
+    """
+    # Decomposing the BeautifulSoup object alone only clears the root, as the document is not chained to it
+    for element in list(soup.contents):
+        # The root also holds strings such as the doctype, which have no children to break up
+        if isinstance(element, Tag):
+            element.decompose()
+        else:
+            element.extract()
+    soup.decompose()
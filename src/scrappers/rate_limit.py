@@ -0,0 +1,166 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from config.settings import HOST_RATE_LIMITS, DEFAULT_RATE_LIMIT, RATE_INCREASE, RATE_DECREASE
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Tokens refill at `rate` per second up to `burst`.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take one token and return how many seconds the caller has to wait before using it.
+        """
+        with self._lock:
+            return self._reserve(time.monotonic())
+
+    def _reserve(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0
+        return -self._tokens / self.rate
+
+    def acquire(self):
+        """
+        Block until a token is available.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    A token bucket whose rate follows the host's health (additive increase, multiplicative decrease).
+    Every healthy response raises the rate by `increase` up to `max_rate`; a throttling response multiplies it by
+    `decrease` down to `min_rate`, drops the saved-up burst and honours the Retry-After header.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=None, max_rate=None, increase=RATE_INCREASE, decrease=RATE_DECREASE):
+        super().__init__(rate, burst)
+        self.min_rate = rate if min_rate is None else min_rate
+        self.max_rate = rate if max_rate is None else max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._blocked_until = 0
+        self.requests = 0
+        self.successes = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def _reserve(self, now):
+        wait = max(super()._reserve(now), self._blocked_until - now)
+        self.requests += 1
+        self.waited += wait
+        return wait
+
+    def on_success(self):
+        with self._lock:
+            self.successes += 1
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """
+        :param retry_after: Seconds the host asked us to wait, if any.
+        """
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'requests': self.requests,
+                'successes': self.successes,
+                'throttled': self.throttled,
+                'waited_seconds': round(self.waited, 3),
+                'blocked_for': round(max(0, self._blocked_until - time.monotonic()), 3),
+            }
+
+
+def parse_retry_after(value):
+    """
+    Return the seconds to wait from a Retry-After header, given either as seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(host):
+    """
+    Return the rate limiter for a host, creating it from HOST_RATE_LIMITS on first use.
+    """
+    with _buckets_lock:
+        if host not in _buckets:
+            limit = HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+            _buckets[host] = AdaptiveRateLimiter(limit['rate'], limit['burst'], limit.get('min_rate'),
+                                                 limit.get('max_rate'))
+        return _buckets[host]
+
+
+def set_rate_limit(host, rate, burst=1, min_rate=None, max_rate=None):
+    """
+    Override the politeness budget of a host for the rest of the process.
+    Without min_rate and max_rate the rate stays fixed.
+    """
+    with _buckets_lock:
+        _buckets[host] = AdaptiveRateLimiter(rate, burst, min_rate, max_rate)
+
+
+def rate_metrics():
+    """
+    Return the current state of every host's rate limiter.
+    """
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {host: bucket.snapshot() for host, bucket in buckets.items()}
+
+
+def wait_for_turn(url):
+    """
+    Block until the politeness budget of the URL's host allows another request.
+    """
+    get_bucket(urlsplit(url).hostname).acquire()
+
+
+def report_response(url, status_code, retry_after=None, throttle_statuses=()):
+    """
+    Feed the outcome of a request back to the rate limiter of the URL's host.
+
+    :return: True if the host throttled the request.
+    """
+    bucket = get_bucket(urlsplit(url).hostname)
+    if status_code in throttle_statuses:
+        bucket.on_throttle(parse_retry_after(retry_after))
+        return True
+    bucket.on_success()
+    return False
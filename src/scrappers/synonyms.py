@@ -1,45 +1,83 @@
-import requests
-from bs4 import BeautifulSoup
 import random
-import time
 
+from src.instrumentation.metrics import metrics
+from src.scrappers.entry_cache import EntryNotFound, cached_entry, cached_entry_async
+from src.scrappers.http_client import fetch
+from src.scrappers.parsing import free_soup, make_soup, SYNONYMS_STRAINER
 
+URL_TEMPLATE = "https://www.oxfordlearnersdictionaries.com/definition/english/{word}_1?q={word}"
+
+# List of User-Agent strings to rotate
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/56.0.2924.87 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:54.0) Gecko/20100101 Firefox/54.0',
+    # Add more User-Agent strings if necessary
+]
+
+
+@cached_entry('synonyms')
 def get_synonyms(word):
-    # List of User-Agent strings to rotate
-    user_agents = [
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/56.0.2924.87 Safari/537.36',
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:54.0) Gecko/20100101 Firefox/54.0',
-        # Add more User-Agent strings if necessary
-    ]
+    markup = fetch_synonyms_page(word)
+    with metrics.timer('parse.synonyms', word):
+        return parse_synonyms(markup, word)
+
 
+def fetch_synonyms_page(word):
+    """
+    Download the Oxford Learner's dictionary page of a word.
+    """
     # Randomly select a User-Agent
-    headers = {'User-Agent': random.choice(user_agents)}
-
-    url = f"https://www.oxfordlearnersdictionaries.com/definition/english/{word}_1?q={word}"
-
-    # Implement a retry mechanism with exponential backoff
-    for attempt in range(5):
-        try:
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                break
-            elif response.status_code == 403:
-                print(f"Access denied (403) for word '{word}'. Retrying...")
-                time.sleep(2 ** attempt + random.uniform(0, 1))
-        except requests.exceptions.RequestException as e:
-            print(f"Request failed: {e}. Retrying...")
-            time.sleep(2 ** attempt + random.uniform(0, 1))
-    else:
-        raise Exception(f"Error: Unable to fetch data for the word '{word}' after multiple attempts.")
-
-    soup = BeautifulSoup(response.content, 'html.parser')
+    headers = {'User-Agent': random.choice(USER_AGENTS)}
+
+    url = URL_TEMPLATE.format(word=word)
+
+    # Throttling (403/429) is retried by fetch, paced by the host's rate controller
+    response = fetch(url, headers=headers)
+    if response.status_code == 404:
+        raise EntryNotFound(f"Error: No Oxford entry for the word '{word}'.")
+    if response.status_code != 200:
+        raise Exception(f"Error: Unable to fetch data for the word '{word}' (status {response.status_code}).")
+    return response.content
+
+
+@cached_entry_async('synonyms')
+async def get_synonyms_async(word, client):
+    """
+    The async counterpart of get_synonyms, using a client from create_async_client.
+    """
+    from src.scrappers.async_client import fetch_async
 
+    headers = {'User-Agent': random.choice(USER_AGENTS)}
+    url = URL_TEMPLATE.format(word=word)
+
+    response = await fetch_async(client, url, headers=headers)
+    if response.status_code == 404:
+        raise EntryNotFound(f"Error: No Oxford entry for the word '{word}'.")
+    if response.status_code != 200:
+        raise Exception(f"Error: Unable to fetch data for the word '{word}' (status {response.status_code}).")
+
+    with metrics.timer('parse.synonyms', word):
+        return parse_synonyms(response.content, word)
+
+
+def parse_synonyms(markup, word):
+    """
+    Extract the synonyms and their examples from an Oxford Learner's dictionary page.
+    """
+    soup = make_soup(markup, SYNONYMS_STRAINER)
+    try:
+        return extract_synonyms(soup, word)
+    finally:
+        free_soup(soup)
+
+
+def extract_synonyms(soup, word):
     # Find the section containing synonyms and example sentences
     synonym_section = soup.find('span', {'class': 'body'})
 
     if not synonym_section:
-        raise Exception(f"No synonyms found for the word '{word}'.")
+        raise EntryNotFound(f"No synonyms found for the word '{word}'.")
 
     # Extract synonyms and their corresponding example sentences
     synonyms_with_examples = []
@@ -52,9 +90,6 @@ def get_synonyms(word):
             'examples': examples
         })
 
-    # Random delay to avoid triggering anti-scraping mechanisms
-    time.sleep(random.uniform(1, 3))
-
     return synonyms_with_examples
 
 